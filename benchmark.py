@@ -0,0 +1,247 @@
+import os
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(script_dir, "modules"))
+
+import argparse
+import tempfile
+import tracemalloc
+import subprocess as sp
+from cparser import Parser
+from scanner import Scanner
+from vm import VirtualMachine, CompiledVirtualMachine
+from c_backend import build_executable
+from optimizer import opt_levels
+from compiler import get_tester_file
+
+'''
+Benchmarks for the Simple C Compiler
+
+Usage: python benchmark.py SUITE [source_file]
+'''
+
+
+def timed(fun, *args, repeat=1, **kwargs):
+    ''' returns best wall clock time of repeat calls and the last result '''
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fun(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def compile_source(source_file, opt_level=0):
+    parser = Parser(source_file, build_tree=False, opt_level=opt_level)
+    parser.parse()
+    if parser.context.error_flag:
+        raise RuntimeError(f"Compilation of {source_file} failed!")
+    return parser
+
+
+def bench_execution(args):
+    ''' compares execution time of the compiled program on all backends '''
+    source_file = args.source_file or os.path.join(script_dir, "input", "input_loop.c")
+    code_generator = compile_source(source_file).code_generator
+    program_block = code_generator.program_block
+    code_generator.save_output()
+    output_dir = os.path.dirname(code_generator.output_file)
+
+    def run_vm(vm_class):
+        vm = vm_class(program_block)
+        return vm.run(), vm.steps
+
+    def run_tester():
+        return sp.run(get_tester_file(), cwd=output_dir, stdout=sp.DEVNULL,
+                      stderr=sp.DEVNULL, timeout=args.timeout)
+
+    results = []
+    try:
+        t, _ = timed(run_tester)
+        results.append(("tester binary", t))
+    except (sp.TimeoutExpired, RuntimeError, OSError) as e:
+        print("Tester program failed:", str(e))
+
+    t, (output, steps) = timed(run_vm, VirtualMachine)
+    results.append(("vm tier 1", t))
+    t, _ = timed(run_vm, CompiledVirtualMachine, repeat=args.repeat)
+    results.append(("vm tier 2", t))
+
+    code_generator.save_c_output()
+    c_file = code_generator.c_output_file
+    exe_file = os.path.splitext(c_file)[0] + (".exe" if os.name == "nt" else "")
+    build_time, exe_file = timed(build_executable, c_file, exe_file)
+    if exe_file is not None:
+        t, _ = timed(sp.check_output, [exe_file], repeat=args.repeat)
+        results.append((f"native (+{build_time:.3f} s build)", t))
+    else:
+        print("No C compiler found, skipping native backend.")
+
+    print(f"{os.path.basename(source_file)}: {steps} instructions executed, output {output}")
+    for name, t in results:
+        print(f"{name:32} {t:10.6f} s  {steps / t:14.0f} instructions/s")
+
+
+def scaled_source(args, scale, default="input_hard.c"):
+    ''' writes source file repeated args.scale (or scale) times into a temporary file '''
+    args.scale = args.scale or scale
+    source_file = args.source_file or os.path.join(script_dir, "input", default)
+    with open(source_file, "r", encoding="utf-8") as f:
+        source = f.read()
+    scaled_file = tempfile.NamedTemporaryFile("w", suffix=".c", delete=False, encoding="utf-8")
+    with scaled_file:
+        scaled_file.write(source * args.scale)
+    return scaled_file.name, len(source) * args.scale
+
+
+def bench_scanner(args):
+    ''' measures scanning speed in characters per second '''
+    scaled_file, size = scaled_source(args, 500)
+
+    def classify_per_char(scanner, text):
+        resolve = scanner._resolve_dfa_table_column
+        return [resolve(c) for c in text]
+
+    def classify_translate(scanner, text):
+        return text.encode("ascii", "replace").translate(scanner._column_table)
+
+    def scan(**kwargs):
+        scanner = Scanner(scaled_file, **kwargs)
+        n = 0
+        while scanner.get_next_token()[0] != "EOF":
+            n += 1
+        return n
+
+    def tokenize(source_file, **kwargs):
+        return len(Scanner(source_file, **kwargs).tokenize_all()) - 1
+
+    try:
+        scanner = Scanner(scaled_file)
+        with open(scaled_file, "r", encoding="utf-8") as f:
+            text = f.read()
+        print(f"{os.path.basename(args.source_file or 'input_hard.c')} x {args.scale}: {size} characters")
+        for name, fun in (("classify per character", classify_per_char),
+                          ("classify with bytes.translate", classify_translate)):
+            t, _ = timed(fun, scanner, text, repeat=args.repeat)
+            print(f"{name:32} {t:10.6f} s  {size / t:14.0f} characters/s")
+        for name, kwargs in (("scan mmap input, dfa", {"use_regex" : False}),
+                             ("scan chunked input, dfa", {"use_mmap" : False, "use_regex" : False}),
+                             ("scan mmap input, regex", {}),
+                             ("scan chunked input, regex", {"use_mmap" : False})):
+            t, n = timed(scan, repeat=args.repeat, **kwargs)
+            print(f"{name:32} {t:10.6f} s  {size / t:14.0f} characters/s  {n / t:10.0f} tokens/s")
+        for name, kwargs in (("tokenize_all mmap input", {}),
+                             ("tokenize_all chunked input", {"use_mmap" : False})):
+            t, n = timed(tokenize, scaled_file, repeat=args.repeat, **kwargs)
+            print(f"{name:32} {t:10.6f} s  {size / t:14.0f} characters/s  {n / t:10.0f} tokens/s")
+    finally:
+        os.remove(scaled_file)
+
+    # machine generated program with lots of distinct identifiers
+    names_file = tempfile.NamedTemporaryFile("w", suffix=".c", delete=False)
+    with names_file:
+        names_file.write("".join([f"int v{i};\n" for i in range(30000)]))
+        names_file.write("void main(void) { output(v0); }\n")
+    size = os.path.getsize(names_file.name)
+    try:
+        t, n = timed(tokenize, names_file.name, repeat=args.repeat)
+        print(f"{'tokenize_all 30000 identifiers':32} {t:10.6f} s  {size / t:14.0f} characters/s  {n / t:10.0f} tokens/s")
+    finally:
+        os.remove(names_file.name)
+
+
+def bench_parser(args):
+    ''' compares parsing with tokens pulled from the scanner one by one
+        and with input tokenized into a token stream beforehand, parsing
+        with and without building the parse tree and the parser engines '''
+    scaled_file, size = scaled_source(args, 20)
+
+    def parse(tokenize, build_tree=False, engine="table"):
+        parser = Parser(scaled_file, build_tree=build_tree, engine=engine)
+        if tokenize is None:
+            parser.parse()
+        else:
+            parser.parse(tokenize(parser.scanner))
+        return parser
+
+    def peak_memory(fun, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            fun(*args, **kwargs)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    try:
+        n = len(Scanner(scaled_file).tokenize_all()) - 1
+        print(f"{os.path.basename(args.source_file or 'input_hard.c')} x {args.scale}: {size} characters, {n} tokens")
+        for name, tokenize in (("get_next_token", None),
+                               ("tokenize_all", Scanner.tokenize_all),
+                               ("tokenize_batches", Scanner.tokenize_batches)):
+            t, _ = timed(parse, tokenize, repeat=args.repeat)
+            print(f"{name:32} {t:10.6f} s  {size / t:14.0f} characters/s  {n / t:10.0f} tokens/s")
+        for name, build_tree in (("with parse tree", True),
+                                 ("without parse tree", False)):
+            t, _ = timed(parse, None, build_tree, repeat=args.repeat)
+            peak = peak_memory(parse, None, build_tree)
+            print(f"{name:32} {t:10.6f} s  {size / t:14.0f} characters/s  {n / t:10.0f} tokens/s  {peak / 2**20:8.1f} MB peak")
+        # the engines parse the same pre-tokenized input, so that scanning is not timed
+        token_stream = Scanner(scaled_file).tokenize_all()
+        for name, engine in (("table engine (pre-tokenized)", "table"),
+                             ("rd engine (pre-tokenized)", "rd")):
+            t, _ = timed(parse, lambda scanner: token_stream, False, engine, repeat=args.repeat)
+            print(f"{name:32} {t:10.6f} s  {size / t:14.0f} characters/s  {n / t:10.0f} tokens/s")
+    finally:
+        os.remove(scaled_file)
+
+
+def bench_optimizer(args):
+    ''' compares the static (program size) and dynamic (executed) instruction
+        counts of the programs in the TXX tests at each optimization level '''
+    if args.source_file:
+        source_files = [args.source_file]
+    else:
+        test_dir = os.path.join(script_dir, "tests")
+        source_files = [os.path.join(test_dir, test_case, "input.txt")
+                        for test_case in sorted(os.listdir(test_dir)) if test_case.startswith("TXX")]
+    totals = {opt_level : [0, 0] for opt_level in opt_levels}
+    print(f"{'Program':24}" + "".join(f"{f'-O{opt_level} static':>12}{'dynamic':>10}" for opt_level in opt_levels))
+    for source_file in source_files:
+        counts = []
+        for opt_level in opt_levels:
+            try:
+                program_block = compile_source(source_file, opt_level).code_generator.program_block
+            except RuntimeError:
+                break
+            vm = VirtualMachine(program_block)
+            try:
+                vm.run()
+            except RuntimeError:
+                pass # counts the steps until the failure
+            counts.append((len(program_block), vm.steps))
+            totals[opt_level][0] += len(program_block)
+            totals[opt_level][1] += vm.steps
+        name = os.path.relpath(source_file, script_dir)
+        print(f"{name:24}" + ("".join(f"{static:12}{dynamic:10}" for static, dynamic in counts) or "  compilation failed"))
+    print(f"{'Total':24}" + "".join(f"{static:12}{dynamic:10}" for static, dynamic in totals.values()))
+
+
+suites = {
+    "execution" : bench_execution,
+    "optimizer" : bench_optimizer,
+    "scanner" : bench_scanner,
+    "parser" : bench_parser,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks for the Simple C Compiler.')
+    parser.add_argument('suite', choices=suites.keys(), help='Benchmark suite to run.')
+    parser.add_argument('source_file', nargs='?', default=None, help='Path to C source file used in the benchmark.')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeat fast benchmarks and report the best time.')
+    parser.add_argument('--scale', type=int, default=None, help='How many times the source file is repeated in scanner (default 500) and parser (default 20) benchmarks.')
+    parser.add_argument('--timeout', type=int, default=60, help='Timeout in seconds for external programs.')
+    args = parser.parse_args()
+    suites[args.suite](args)
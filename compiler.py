@@ -1,17 +1,23 @@
 import os
 import sys
+import glob
 import time
 import argparse
 import platform
 import subprocess as sp 
+from concurrent.futures import ProcessPoolExecutor
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.join(script_dir, "modules"))
 
 from cparser import Parser
-from scanner import Scanner, SymbolTableManager
+from scanner import Scanner
 from semantic_analyser import SemanticAnalyser
-from code_gen import CodeGen, MemoryManager
+from code_gen import CodeGen
+from context import CompilationContext
+from vm import VirtualMachine, CompiledVirtualMachine
+from c_backend import build_executable
+from optimizer import opt_levels
 
 
 # Maximal virtual memory for compiled program process (in bytes).
@@ -22,22 +28,14 @@ def limit_virtual_memory():
     resource.setrlimit(resource.RLIMIT_AS, (MAX_VIRTUAL_MEMORY, MAX_VIRTUAL_MEMORY))
 
 
-def compile(args):
-    print("Compiling", args.source_file)
-    SymbolTableManager.init()
-    MemoryManager.init()
-    parser = Parser(args.source_file)
+def compile_file(source_file, args, context):
+    ''' compiles source file and saves the output files requested in args,
+        returns the parser and the compilation time '''
+    parser = Parser(source_file, keep_tokens=args.tokens, max_state_size=args.max_state_size, context=context,
+                    build_tree=args.abstract_syntax_tree, engine=args.parser_engine, opt_level=args.opt_level)
     start = time.time()
     parser.parse()
     stop = time.time() - start
-    print(f"Compilation took {stop:.6f} s")
-    if not SymbolTableManager.error_flag:
-        print("Compilation successful!")
-    else:
-        print("Compilation failed due to the following errors:\n")
-        print(parser.scanner.lexical_errors)
-        print(parser.syntax_errors)
-        print(parser.semantic_analyzer.semantic_errors)
     if args.abstract_syntax_tree:
         parser.save_parse_tree()
     if args.symbol_table:
@@ -49,51 +47,211 @@ def compile(args):
         parser.scanner.save_lexical_errors()
         parser.semantic_analyzer.save_semantic_errors()
     parser.code_generator.save_output()
-    if args.run and not SymbolTableManager.error_flag:
+    if args.cfg:
+        parser.code_generator.save_cfg()
+    return parser, stop
+
+
+def compile(args):
+    print("Compiling", args.source_file)
+    context = CompilationContext()
+    parser, stop = compile_file(args.source_file, args, context)
+    print(f"Compilation took {stop:.6f} s")
+    if not context.error_flag:
+        print("Compilation successful!")
+        if args.opt_level:
+            code_generator = parser.code_generator
+            print(f"Optimization removed {code_generator.removed_instructions} instructions")
+            print(f"Temporaries use {code_generator.memory_manager.temp_offset // 4} slots, peak per function: " +
+                  ", ".join(f"{name} {peak}" for name, peak in code_generator.temp_peaks.items()))
+    else:
+        print("Compilation failed due to the following errors:\n")
+        print(parser.scanner.lexical_errors)
+        print(parser.syntax_errors)
+        print(parser.semantic_analyzer.semantic_errors)
+    exe_file = None
+    if args.native and not context.error_flag:
+        parser.code_generator.save_c_output()
+        exe_file = build_native(parser.code_generator.c_output_file)
+    if args.run and not context.error_flag:
         print("Executing compiled program")
-        plat = platform.system()
-        if plat == "Windows":
-            tester_file = os.path.join(script_dir, "interpreter", "tester_Windows.exe")
-        elif plat == "Linux":
-            tester_file = os.path.join(script_dir, "interpreter", "tester_Linux.out")
-        elif plat == "Darwin":
-            tester_file = os.path.join(script_dir, "interpreter", "tester_Mac.out")
+        if args.tester:
+            run_tester(args)
+        elif args.native:
+            if exe_file is not None:
+                run_native(exe_file)
+        else:
+            run_vm(parser.code_generator.program_block, args)
+
+
+def get_batch_files(pattern):
+    ''' returns C source files in a directory or matching a glob pattern '''
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.c")
+    return sorted(f for f in glob.glob(pattern, recursive=True) if os.path.isfile(f))
+
+
+def compile_batch_file(source_file, output_dir, errors_dir, args):
+    ''' compiles one file of a batch in a worker process, returns
+        (status, compilation time, number of three address codes) '''
+    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(errors_dir, exist_ok=True)
+    context = CompilationContext(output_dir, errors_dir)
+    try:
+        parser, stop = compile_file(source_file, args, context)
+    except Exception as e:
+        return f"crashed: {e}", 0.0, 0
+    if not context.error_flag:
+        return "ok", stop, len(parser.code_generator.program_block)
+    if not args.error_files:
+        parser.save_syntax_errors()
+        parser.scanner.save_lexical_errors()
+        parser.semantic_analyzer.save_semantic_errors()
+    return "failed", stop, len(parser.code_generator.program_block)
+
+
+def compile_batch(args):
+    ''' compiles all files matching args.batch in parallel, each
+        into its own output and error directory '''
+    source_files = [os.path.abspath(f) for f in get_batch_files(args.batch)]
+    if not source_files:
+        print("No source files found from", args.batch)
+        return 1
+    # name the output directories by the paths relative to the common parent directory
+    common_dir = os.path.commonpath([os.path.dirname(f) for f in source_files])
+    names = [os.path.splitext(os.path.relpath(f, common_dir))[0].replace(os.sep, "_") for f in source_files]
+    print(f"Compiling {len(source_files)} files with {args.jobs} jobs")
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [executor.submit(compile_batch_file, source_file,
+                                   os.path.join(script_dir, "output", name),
+                                   os.path.join(script_dir, "errors", name), args)
+                   for source_file, name in zip(source_files, names)]
+        results = [future.result() for future in futures]
+    stop = time.time() - start
+
+    width = max(len("File"), *[len(name) for name in names])
+    print(f"{'File':{width}}  {'Status':8}  {'Time (s)':>10}  {'TAC':>6}")
+    for name, (status, compile_time, tac_count) in zip(names, results):
+        print(f"{name:{width}}  {status:8}  {compile_time:10.6f}  {tac_count:6}")
+    failures = len([status for status, _, _ in results if status != "ok"])
+    print(f"{len(results) - failures}/{len(results)} files compiled successfully in {stop:.6f} s")
+    return 1 if failures else 0
+
+
+def run_vm(program_block, args):
+    start = time.time()
+    if args.vm_tier == 2:
+        vm = CompiledVirtualMachine(program_block)
+    else:
+        vm = VirtualMachine(program_block)
+    try:
+        vm.run(trace=args.verbose)
+    except RuntimeError as e:
+        print("RuntimeError:", str(e))
+    else:
+        stop = time.time() - start
+        print(f"Execution took {stop:.6f} s")
+    print("Program output:")
+    print("\n".join(str(value) for value in vm.output))
+
+
+def build_native(c_file):
+    exe_file = os.path.splitext(c_file)[0] + (".exe" if platform.system() == "Windows" else "")
+    start = time.time()
+    try:
+        exe_file = build_executable(c_file, exe_file)
+    except sp.CalledProcessError as e:
+        print("C compilation failed:", e.output.decode("utf-8"))
+        return None
+    if exe_file is None:
+        print("No C compiler found, can not build native executable!")
+        return None
+    stop = time.time() - start
+    print(f"Native build took {stop:.6f} s")
+    return exe_file
+
+
+def run_native(exe_file):
+    start = time.time()
+    try:
+        preexec_fn = limit_virtual_memory if platform.system() == "Linux" else None
+        output = sp.check_output(exe_file, timeout=10, preexec_fn=preexec_fn).decode("utf-8")
+    except sp.TimeoutExpired:
+        print("RuntimeError: Execution timed out!")
+        return
+    except sp.CalledProcessError as e:
+        print("RuntimeError: Execution failed with exit code", e.returncode)
+        output = e.output.decode("utf-8")
+    else:
+        stop = time.time() - start
+        print(f"Execution took {stop:.6f} s")
+    print("Program output:")
+    print(output, end="")
+
+
+def get_tester_file():
+    plat = platform.system()
+    if plat == "Windows":
+        return os.path.join(script_dir, "interpreter", "tester_Windows.exe")
+    elif plat == "Linux":
+        return os.path.join(script_dir, "interpreter", "tester_Linux.out")
+    elif plat == "Darwin":
+        return os.path.join(script_dir, "interpreter", "tester_Mac.out")
+    else:
+        raise RuntimeError("Unsupported operating system for code execution!")
+
+
+def run_tester(args):
+    plat = platform.system()
+    tester_file = get_tester_file()
+    output_file = os.path.join(script_dir, "output", "output.txt")
+    output_dir = os.path.dirname(output_file)
+    if os.path.exists(output_file):
+        preexec_fn = limit_virtual_memory if plat == "Linux" else None
+        stderr = sp.PIPE if not args.verbose else None
+        start = time.time()
+        try:
+            tester_output = sp.check_output(tester_file, cwd=output_dir, 
+                                            stderr=stderr, timeout=10, 
+                                            preexec_fn=preexec_fn).decode("utf-8")
+        except sp.TimeoutExpired:
+            print("RuntimeError: Execution timed out!")
+            return
         else:
-            raise RuntimeError("Unsupported operating system for code execution!")
-        output_file = os.path.join(script_dir, "output", "output.txt")
-        output_dir = os.path.dirname(output_file)
-        if os.path.exists(output_file):
-            preexec_fn = limit_virtual_memory if plat == "Linux" else None
-            stderr = sp.PIPE if not args.verbose else None
-            start = time.time()
-            try:
-                tester_output = sp.check_output(tester_file, cwd=output_dir, 
-                                                stderr=stderr, timeout=10, 
-                                                preexec_fn=preexec_fn).decode("utf-8")
-            except sp.TimeoutExpired:
-                print("RuntimeError: Execution timed out!")
-            else:
-                if not args.verbose:
-                    tester_output = "\n".join([line.replace("PRINT", "").strip() 
-                                               for line in tester_output.splitlines()
-                                               if line.startswith("PRINT")])
-                stop = time.time() - start
-                print(f"Execution took {stop:.6f} s")
-            print("Program output:")
-            print(tester_output)
+            if not args.verbose:
+                tester_output = "\n".join([line.replace("PRINT", "").strip() 
+                                           for line in tester_output.splitlines()
+                                           if line.startswith("PRINT")])
+            stop = time.time() - start
+            print(f"Execution took {stop:.6f} s")
+        print("Program output:")
+        print(tester_output)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Simple C Compiler written in Python')
-    parser.add_argument("source_file", help="Path to C source file.")
+    parser.add_argument("source_file", nargs="?", help="Path to C source file, - reads the source from stdin.")
+    parser.add_argument('--batch', metavar='DIR_OR_GLOB', help='Compile all C source files in a directory or matching a glob pattern in parallel, outputs of each file go to output/NAME and errors/NAME.')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='Number of parallel compilation processes in --batch mode.')
     parser.add_argument('-r', '--run', action='store_true', help='Run the output program after compilation.')
+    parser.add_argument('--tester', action='store_true', help='Run the output program with the prebuilt tester program instead of the built-in virtual machine.')
+    parser.add_argument('--native', action='store_true', help='Translate the output program to C and build it with the system C compiler (run it with --run).')
+    parser.add_argument('--vm-tier', type=int, choices=[1, 2], default=1, help='Virtual machine execution tier: 1 = interpreter, 2 = compile basic blocks to Python functions (faster).')
     parser.add_argument('-v', '--verbose', action='store_true', help='Print all used three address codes.')
     parser.add_argument('-ef', '--error-files', action='store_true', help='Save compilation errors to text files.')
     parser.add_argument('-ast', '--abstract-syntax-tree', action='store_true', help='Save abstract syntax tree into a text file.')
     parser.add_argument('-st', '--symbol-table', action='store_true', help='Save symbol table into a text file.')
+    parser.add_argument('--cfg', action='store_true', help='Save the control flow graph of the output program in the Graphviz dot language (output/cfg.dot).')
     parser.add_argument('-t', '--tokens', action='store_true', help='Save lexed tokens into a text file.')
+    parser.add_argument('--parser-engine', choices=["table", "rd"], default="table", help='Parse with the table driven LL(1) parser or the faster generated recursive descent parser (which can not save the abstract syntax tree).')
+    parser.add_argument('-O', dest='opt_level', type=int, choices=opt_levels, default=0, help='Optimization level: 0 = none, 1 = constant folding and propagation, 2 = 1 + peephole optimizations (e.g. -O2).')
+    parser.add_argument('--max-state-size', type=int, default=float("inf"), help='Keep only the latest N lexical errors (and lines of tokens with --tokens) in memory when compiling huge source files.')
     args = parser.parse_args()
-    if not os.path.isabs(args.source_file):
-        args.source_file = os.path.abspath(script_dir)
-    args = parser.parse_args()
+    if args.parser_engine == "rd" and args.abstract_syntax_tree:
+        parser.error("--abstract-syntax-tree requires --parser-engine table")
+    if args.batch:
+        sys.exit(compile_batch(args))
+    if args.source_file is None:
+        parser.error("source_file or --batch is required")
     compile(args)
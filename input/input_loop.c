@@ -0,0 +1,45 @@
+/* 
+ * CPU heavy example source code
+ * 
+ * counts primes below N by trial division
+ */
+
+int isPrime(int n) {
+    int d;
+    int q;
+    int prime;
+
+    prime = 1;
+    d = 2;
+    while (d * d < n + 1) {
+        q = 0;
+        /* no division operator, find the largest q with q * d <= n */
+        while (q * d < n + 1) {
+            q = q + 1;
+        }
+        q = q - 1;
+        if (q * d == n) {
+            prime = 0;
+            break;
+        } else {
+            d = d + 1;
+        }
+    }
+    return prime;
+}
+
+void main(void) {
+    int i;
+    int N;
+    int count;
+
+    i = 2;
+    count = 0;
+    N = 500; // change me to make the program run longer
+
+    while (i < N) {
+        count = count + isPrime(i);
+        i = i + 1;
+    }
+    output(count);
+}
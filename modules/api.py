@@ -0,0 +1,98 @@
+'''
+API module of the Simple C Compiler
+
+Compiles C source text into three address codes in memory,
+writing the output files is an opt-in step on top of it
+
+Usage:
+
+    result = compile_source("void main(void) { output(42); }")
+    if result.success:
+        print(result.instructions)
+        print(result.run())
+    else:
+        print(result.diagnostics)
+    result.save() # optional, writes the output files
+'''
+
+import os
+from collections import namedtuple
+
+from cparser import Parser
+from context import CompilationContext
+from vm import VirtualMachine, CompiledVirtualMachine
+from ir import format_instruction
+
+
+# kind is "lexical", "syntax" or "semantic"
+Diagnostic = namedtuple("Diagnostic", ["kind", "line", "message"])
+
+
+class CompileResult(object):
+    ''' Outcome of compiling one source text: the three address codes,
+        diagnostics and the optionally requested artifacts '''
+
+    def __init__(self, parser, want_tokens=False):
+        self.parser = parser
+        self.context = parser.context
+        self.success = not self.context.error_flag
+        self.program_block = parser.code_generator.program_block # Instructions by line number
+        self.instructions = [format_instruction(instruction) for instruction in self.program_block]
+        diagnostics = [Diagnostic("lexical", lineno, f"'{lexim}' rejected, reason: {error}")
+                       for lineno, lexim, error in parser.scanner._lexical_errors]
+        diagnostics += [Diagnostic("syntax", lineno, error) for lineno, error in parser._syntax_errors]
+        diagnostics += [Diagnostic("semantic", lineno, error)
+                        for lineno, error in parser.semantic_analyzer._semantic_errors]
+        self.diagnostics = sorted(diagnostics, key=lambda d: d.line)
+        self.symbols = list(parser.scanner.identifiers)
+        self.ast = parser.parse_tree # ParseTree, None unless want_ast
+        self.tokens = parser.scanner.tokens if want_tokens else None # tokens by line number
+
+
+    def __repr__(self):
+        return f"CompileResult(success={self.success}, instructions={len(self.instructions)}, " \
+               f"diagnostics={len(self.diagnostics)})"
+
+
+    def run(self, vm_tier=1):
+        ''' executes the compiled program in the virtual machine
+            and returns the list of output values '''
+        if not self.success:
+            raise RuntimeError("Can not run a program that failed to compile!")
+        vm = CompiledVirtualMachine(self.program_block) if vm_tier == 2 else VirtualMachine(self.program_block)
+        return vm.run()
+
+
+    def save(self, output_dir=None, errors_dir=None):
+        ''' writes the output program, the error files and the requested
+            artifacts into output_dir and errors_dir (defaults: ./output and ./errors) '''
+        files = self.context.files = {}
+        self.parser.code_generator.save_output()
+        self.parser.save_syntax_errors()
+        self.parser.scanner.save_lexical_errors()
+        self.parser.semantic_analyzer.save_semantic_errors()
+        self.parser.scanner.save_symbol_table()
+        if self.ast is not None:
+            self.parser.save_parse_tree()
+        if self.tokens is not None:
+            self.parser.scanner.save_tokens()
+        file_context = CompilationContext(output_dir, errors_dir)
+        for file_name, text in files.items():
+            if file_name.endswith("errors.txt"):
+                file_path = file_context.errors_path(file_name)
+            else:
+                file_path = file_context.output_path(file_name)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            file_context.write(file_path, text)
+
+
+def compile_source(text, *, want_ast=False, want_tokens=False, engine="table", opt_level=0):
+    ''' compiles C source text without touching the disk, the parse tree
+        and the lexed tokens are kept only if requested, engine "rd" selects
+        the recursive descent parser (which can not build the parse tree)
+        and opt_level the optimization passes (see CodeGen.optimize) '''
+    context = CompilationContext(in_memory=True)
+    parser = Parser(None, keep_tokens=want_tokens, context=context, source=text, build_tree=want_ast, engine=engine,
+                    opt_level=opt_level)
+    parser.parse()
+    return CompileResult(parser, want_tokens=want_tokens)
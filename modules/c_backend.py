@@ -0,0 +1,210 @@
+'''
+C Backend module of the Simple C Compiler
+
+Lowers the three address code program block into a single C source file
+which can be built into a native executable with the system C compiler
+'''
+
+import os
+import shutil
+import subprocess as sp
+from ir import ASSIGN, ADD, SUB, MULT, EQ, LT, JP, JPF, PRINT, DIRECT, IMMEDIATE, INDIRECT
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# number of int sized memory cells of the compiled program
+MEMORY_SIZE = 2 ** 20
+
+# memory accesses are checked like in the tester program: addresses out of
+# range and cells that were never written are errors instead of undefined behavior
+c_header = '''\
+#include <stdio.h>
+#include <stdlib.h>
+
+#define MEMORY_SIZE {memory_size}
+#define SCALE {scale}
+
+static int m[MEMORY_SIZE];
+static unsigned char written[MEMORY_SIZE];
+
+static void memory_error(int pc) {{
+    fprintf(stderr, "Invalid access to memory at PC = %d\\n", pc);
+    exit(1);
+}}
+
+static inline int load(long long addr, int pc) {{
+    if (addr < 0 || addr >= (long long)MEMORY_SIZE * SCALE || !written[addr / SCALE])
+        memory_error(pc);
+    return m[addr / SCALE];
+}}
+
+static inline void store(long long addr, int value, int pc) {{
+    if (addr < 0 || addr >= (long long)MEMORY_SIZE * SCALE)
+        memory_error(pc);
+    m[addr / SCALE] = value;
+    written[addr / SCALE] = 1;
+}}
+
+int main(void) {{
+    int t;
+'''
+
+c_footer = '''\
+halt:
+    return 0;
+}}
+'''
+
+c_indirect_jump = '''\
+    t = {target};
+    switch (t) {{
+{cases}
+        default:
+            if (t < 0 || t >= {size}) goto halt;
+            fprintf(stderr, "Invalid jump target %d at PC = {pc}\\n", t);
+            return 1;
+    }}
+'''
+
+
+class CBackend(object):
+    ''' Translates program block into C where memory is a flat int array
+        indexed by address / 4 and accessed through the checked load and
+        store functions of c_header, instructions are labelled statements, JP is
+        a goto and indirect JP @t (function return) is a switch over the
+        possible return addresses '''
+
+    def __init__(self, program):
+        self.program = list(program) # invalid instructions (None) only fail if they are executed
+        # use byte addressed memory if the program does unaligned accesses
+        self.scale = 4
+        for instruction in self.program:
+            if instruction is not None:
+                for operand in instruction[1:]:
+                    if operand is not None and operand[0] != IMMEDIATE and operand[1] % 4:
+                        self.scale = 1
+
+
+    @staticmethod
+    def _operand(operand, pc):
+        mode, value = operand
+        if mode == IMMEDIATE:
+            return f"({value})"
+        if mode == DIRECT:
+            return f"load({value}, {pc})"
+        return f"load(load({value}, {pc}), {pc})"
+
+
+    @staticmethod
+    def _store(operand, value_expr, pc):
+        mode, value = operand
+        if mode == IMMEDIATE:
+            return f'    fprintf(stderr, "Immediate operand can not be assigned to at PC = {pc}\\n");\n    return 1;\n'
+        addr = value if mode == DIRECT else f"load({value}, {pc})"
+        return f"    store({addr}, {value_expr}, {pc});\n"
+
+
+    def _jump_targets(self):
+        ''' returns direct jump targets and possible indirect jump targets
+            (immediate values assigned to memory, i.e. return addresses) '''
+        direct, indirect = set(), set()
+        has_indirect_jump = False
+        for instruction in self.program:
+            if instruction is None:
+                continue
+            op, a, b, _ = instruction
+            if op == JP or op == JPF:
+                target = a if op == JP else b
+                if target[0] == INDIRECT:
+                    has_indirect_jump = True
+                else:
+                    direct.add(target[1])
+            elif op == ASSIGN and a[0] == IMMEDIATE:
+                indirect.add(a[1])
+        n = len(self.program)
+        indirect = {t for t in indirect if 0 <= t < n} if has_indirect_jump else set()
+        return direct, indirect
+
+
+    def _jump(self, target, pc, indirect_targets):
+        mode, value = target
+        if mode != INDIRECT:
+            return f"    goto {self._label(value)};\n"
+        cases = "\n".join([f"        case {t}: goto L{t};" for t in sorted(indirect_targets)])
+        return c_indirect_jump.format(target=self._operand((DIRECT, value), pc), cases=cases,
+                                      size=len(self.program), pc=pc)
+
+
+    def _label(self, pc):
+        return f"L{pc}" if 0 <= pc < len(self.program) else "halt"
+
+
+    def to_c(self):
+        direct_targets, indirect_targets = self._jump_targets()
+        labels = direct_targets | indirect_targets
+        code = [c_header.format(memory_size=MEMORY_SIZE, scale=self.scale)]
+        for pc, instruction in enumerate(self.program):
+            if pc in labels:
+                code.append(f"L{pc}:\n")
+            if instruction is None:
+                code.append(f'    fprintf(stderr, "Invalid instruction at PC = {pc}\\n");\n    return 1;\n')
+                continue
+            op, a, b, c = instruction
+            if op == ASSIGN:
+                code.append(self._store(b, self._operand(a, pc), pc))
+            elif op in (ADD, SUB, MULT):
+                binop = {ADD : "+", SUB : "-", MULT : "*"}[op]
+                code.append(self._store(c, f"{self._operand(a, pc)} {binop} {self._operand(b, pc)}", pc))
+            elif op in (EQ, LT):
+                relop = {EQ : "==", LT : "<"}[op]
+                code.append(self._store(c, f"{self._operand(a, pc)} {relop} {self._operand(b, pc)}", pc))
+            elif op == JP:
+                code.append(self._jump(a, pc, indirect_targets))
+            elif op == JPF:
+                code.append(f"    if (!{self._operand(a, pc)}) {{\n")
+                code.append(self._jump(b, pc, indirect_targets))
+                code.append("    }\n")
+            else: # op == PRINT
+                code.append(f'    printf("%d\\n", {self._operand(a, pc)});\n')
+        code.append(c_footer.format())
+        return "".join(code)
+
+
+def find_c_compiler():
+    return os.environ.get("CC") or shutil.which("cc") or shutil.which("gcc") or shutil.which("clang")
+
+
+def build_executable(c_file, exe_file, cc=None):
+    ''' builds C source file into native executable, returns path to the
+        executable or None if no C compiler is available '''
+    cc = cc or find_c_compiler()
+    if cc is None:
+        return None
+    # -fwrapv gives signed integer overflow well defined wrap around semantics
+    sp.check_output([cc, "-O2", "-fwrapv", "-o", exe_file, c_file], stderr=sp.STDOUT)
+    return exe_file
+
+
+def main(program_file):
+    import time
+    from ir import load_program_file
+    c_file = os.path.splitext(program_file)[0] + ".c"
+    exe_file = os.path.splitext(program_file)[0] + (".exe" if os.name == "nt" else "")
+    with open(c_file, "w") as f:
+        f.write(CBackend(load_program_file(program_file)).to_c())
+    start = time.time()
+    if build_executable(c_file, exe_file) is None:
+        print("No C compiler found!")
+        return
+    stop = time.time() - start
+    print(f"Building took {stop:.6f} s")
+    start = time.time()
+    output = sp.check_output([exe_file]).decode("utf-8")
+    stop = time.time() - start
+    print(f"Execution took {stop:.6f} s")
+    print(output, end="")
+
+
+if __name__ == "__main__":
+    program_file = os.path.join(script_dir, "output/output.txt")
+    main(program_file)
@@ -0,0 +1,357 @@
+'''
+Control Flow Graph module of the Simple C Compiler
+
+Splits a program block (see ir.py) into basic blocks which are
+connected by jump, fall through, call and return edges, and computes
+the dominators and natural loops of the graph
+
+Usage:
+
+    graph = ControlFlowGraph(program_block, entries)
+    for loop in graph.loops():
+        print(graph.starts[loop.header], len(loop.blocks))
+    open("cfg.dot", "w").write(graph.to_dot())
+'''
+
+from bisect import bisect_right
+from array import array
+from collections import namedtuple
+
+from ir import CodeAddress, format_instruction, ASSIGN, JP, JPF, INDIRECT
+
+
+# natural loop of the back edges latches -> header, blocks includes the header
+Loop = namedtuple("Loop", ["header", "latches", "blocks"])
+
+
+def find_leaders(program):
+    ''' returns sorted indices of the first instructions of basic blocks:
+        the entry, jump targets, return addresses, instructions following
+        jumps and unfilled instructions (None), which are blocks of their own '''
+    n = len(program)
+    leaders = {0}
+    for pc, instruction in enumerate(program):
+        if instruction is None:
+            leaders.update((pc, pc + 1))
+            continue
+        op, a, b, _ = instruction
+        if op == JP or op == JPF:
+            leaders.add(pc + 1)
+            target = a if op == JP else b
+            if target is not None and target[0] != INDIRECT:
+                leaders.add(target[1])
+        for operand in instruction[1:]:
+            if operand is not None and isinstance(operand[1], CodeAddress):
+                leaders.add(operand[1])
+    return sorted(pc for pc in leaders if 0 <= pc < n)
+
+
+class ControlFlowGraph(object):
+    ''' Basic blocks of a program and the edges between them. Block b spans
+        the instructions starts[b] ... ends[b] - 1, successors[b] and
+        predecessors[b] are lists of block indices.
+
+        A call is a direct JP preceded by an ASSIGN of its return address
+        (the call sequence of CodeGen), it has an edge to the callee. The
+        indirect JP @t of a return has edges to the return addresses of the
+        calls into the function containing it. Functions are given by entries
+        (function name -> entry instruction), without them every return
+        may go to every return address.
+
+        With interprocedural=False the graph is the union of the graphs of
+        the single functions instead: a call falls through to its return
+        address and returns have no successors. This is the graph to find
+        the loops of the functions in, since a loop containing a call is not
+        dominated by its header in the interprocedural graph. '''
+
+    def __init__(self, program, entries=None, interprocedural=True):
+        self.program = program
+        self.entries = entries
+        self.interprocedural = interprocedural
+        self.entry_pcs = sorted(entries.values()) if entries else []
+        n = len(program)
+        self.starts = find_leaders(program)
+        self.ends = self.starts[1:] + [n] if n else []
+        self.block_of = array('i', [0]) * n
+        for b, (start, end) in enumerate(zip(self.starts, self.ends)):
+            self.block_of[start:end] = array('i', [b]) * (end - start)
+        self.calls = [] # (call block, callee entry pc, return address pc)
+        self.successors = [self._jump_successors(b) for b in range(len(self.starts))]
+        self._add_return_edges()
+        self.predecessors = [[] for _ in self.starts]
+        for b, successors in enumerate(self.successors):
+            for s in successors:
+                self.predecessors[s].append(b)
+        self._idom = None
+        self._dom_order = None
+
+
+    def __len__(self):
+        return len(self.starts)
+
+
+    def _block(self, pc):
+        return self.block_of[pc] if 0 <= pc < len(self.program) else None
+
+
+    def _jump_successors(self, b):
+        ''' successors of block b other than return edges '''
+        start, end = self.starts[b], self.ends[b]
+        last = self.program[end - 1]
+        successors = []
+        if last is None:
+            return successors # execution fails on an unfilled instruction
+        op, a, b_operand, _ = last
+        if op == JP:
+            if a is None or a[0] == INDIRECT:
+                return successors # return edges are added later
+            target = a[1]
+            prev = self.program[end - 2] if end - 2 >= start else None
+            if prev is not None and prev[0] == ASSIGN and prev[1] is not None and isinstance(prev[1][1], CodeAddress):
+                self.calls.append((b, a[1], prev[1][1]))
+                if not self.interprocedural:
+                    target = prev[1][1]
+            target = self._block(target)
+            if target is not None:
+                successors.append(target)
+            return successors
+        if op == JPF:
+            if b_operand is not None and b_operand[0] != INDIRECT:
+                target = self._block(b_operand[1])
+                if target is not None:
+                    successors.append(target)
+        fall_through = self._block(end)
+        if fall_through is not None and fall_through not in successors:
+            successors.append(fall_through)
+        return successors
+
+
+    def function_of(self, pc):
+        ''' returns the entry pc of the function containing pc, or None '''
+        i = bisect_right(self.entry_pcs, pc)
+        return self.entry_pcs[i - 1] if i else None
+
+
+    def is_return(self, b):
+        ''' True if block b ends with an indirect JP (a function return) '''
+        last = self.program[self.ends[b] - 1]
+        return last is not None and last[0] == JP and last[1] is not None and last[1][0] == INDIRECT
+
+
+    def _add_return_edges(self):
+        if not self.interprocedural:
+            return
+        # without entries all functions are None, so every return goes to every return address
+        returns_of = {} # function entry -> return address blocks of the calls into it
+        for _, callee, return_pc in self.calls:
+            block = self._block(return_pc)
+            if block is not None:
+                returns_of.setdefault(self.function_of(callee), set()).add(block)
+        for b, end in enumerate(self.ends):
+            if self.is_return(b):
+                self.successors[b].extend(sorted(returns_of.get(self.function_of(end - 1), ())))
+
+
+    def roots(self):
+        ''' returns the blocks execution can start from: the program entry
+            and the entries of the functions '''
+        roots = [0] if self.starts else []
+        for pc in self.entry_pcs:
+            block = self._block(pc)
+            if block is not None and block not in roots:
+                roots.append(block)
+        return roots
+
+
+    def reverse_postorder(self):
+        ''' returns the blocks reachable from the roots in reverse postorder
+            of a depth first search, a block comes before its successors
+            except along back edges '''
+        visited = bytearray(len(self))
+        postorder = []
+        for root in self.roots():
+            if visited[root]:
+                continue
+            visited[root] = 1
+            stack = [(root, iter(self.successors[root]))]
+            while stack:
+                b, successors = stack[-1]
+                for s in successors:
+                    if not visited[s]:
+                        visited[s] = 1
+                        stack.append((s, iter(self.successors[s])))
+                        break
+                else:
+                    postorder.append(b)
+                    stack.pop()
+        postorder.reverse()
+        return postorder
+
+
+    def immediate_dominators(self):
+        ''' returns the immediate dominator of each block as a list, None for
+            the roots (see roots) and the blocks not reachable from them.
+
+            Computed with the iterative algorithm of Cooper, Harvey and Kennedy
+            over the reverse postorder, which takes a few passes over the
+            blocks for the structured code the compiler generates. The roots
+            hang from a virtual root, so a block reachable from several roots
+            (e.g. a function called from another one) is dominated by none
+            of them. '''
+        if self._idom is not None:
+            return self._idom
+        n_blocks = len(self)
+        virtual = n_blocks # the virtual root has the lowest postorder number
+        order = self.reverse_postorder()
+        number = array('i', [-1]) * (n_blocks + 1) # postorder numbers, -1 = unreachable
+        for i, b in enumerate(order):
+            number[b] = n_blocks - i
+        number[virtual] = n_blocks + 1
+        idom = array('i', [-1]) * (n_blocks + 1)
+        idom[virtual] = virtual
+        roots = set(self.roots())
+        for root in roots:
+            idom[root] = virtual
+        predecessors = self.predecessors
+        changed = True
+        while changed:
+            changed = False
+            for b in order:
+                if b in roots:
+                    continue
+                new_idom = -1
+                for p in predecessors[b]:
+                    if idom[p] == -1:
+                        continue # not processed yet or unreachable
+                    if new_idom == -1:
+                        new_idom = p
+                        continue
+                    # intersect: walk both fingers up to their common dominator
+                    finger = p
+                    while finger != new_idom:
+                        while number[finger] < number[new_idom]:
+                            finger = idom[finger]
+                        while number[new_idom] < number[finger]:
+                            new_idom = idom[new_idom]
+                if idom[b] != new_idom:
+                    idom[b] = new_idom
+                    changed = True
+        self._idom = [None if d == -1 or d == virtual else d for d in idom[:n_blocks]]
+        return self._idom
+
+
+    def _dominator_tree_order(self):
+        ''' returns (enter, leave) numbers of a depth first walk of the
+            dominator tree, a dominates b iff enter[a] <= enter[b] and
+            leave[b] <= leave[a] '''
+        if self._dom_order is not None:
+            return self._dom_order
+        idom = self.immediate_dominators()
+        children = [[] for _ in range(len(self))]
+        tree_roots = []
+        for b, d in enumerate(idom):
+            if d is None:
+                tree_roots.append(b)
+            else:
+                children[d].append(b)
+        enter = array('i', [0]) * len(self)
+        leave = array('i', [0]) * len(self)
+        clock = 0
+        for root in tree_roots:
+            enter[root] = clock
+            clock += 1
+            stack = [(root, iter(children[root]))]
+            while stack:
+                b, nodes = stack[-1]
+                for child in nodes:
+                    enter[child] = clock
+                    clock += 1
+                    stack.append((child, iter(children[child])))
+                    break
+                else:
+                    leave[b] = clock
+                    clock += 1
+                    stack.pop()
+        self._dom_order = (enter, leave)
+        return self._dom_order
+
+
+    def dominates(self, a, b):
+        ''' True if every path from the roots to block b goes through block a '''
+        enter, leave = self._dominator_tree_order()
+        return enter[a] <= enter[b] and leave[b] <= leave[a]
+
+
+    def loops(self):
+        ''' returns the natural loops as Loop tuples sorted by header, the
+            back edges to the same header are merged into one loop. Inner
+            loops are listed separately and their blocks are included in the
+            outer loops '''
+        latches_of = {}
+        for b in self.reverse_postorder():
+            for s in self.successors[b]:
+                if self.dominates(s, b):
+                    latches_of.setdefault(s, []).append(b)
+        idom = self.immediate_dominators()
+        loops = []
+        for header in sorted(latches_of):
+            latches = latches_of[header]
+            blocks = {header}
+            stack = [latch for latch in latches if latch != header]
+            blocks.update(stack)
+            while stack:
+                for p in self.predecessors[stack.pop()]:
+                    if p not in blocks and idom[p] is not None: # skip unreachable blocks
+                        blocks.add(p)
+                        stack.append(p)
+            loops.append(Loop(header, sorted(latches), sorted(blocks)))
+        return loops
+
+
+    def to_dot(self, name="cfg", instructions=True):
+        ''' formats the graph in the Graphviz dot language, the blocks of each
+            function are grouped into a cluster, loop headers are drawn bold,
+            back edges red and call and return edges dashed. The loops are
+            those of the functions (see interprocedural). Without instructions
+            the blocks are labelled by their pc ranges only '''
+        functions = {pc : name for name, pc in (self.entries or {}).items()}
+        graph = self
+        if self.interprocedural: # same blocks, only the call and return edges differ
+            graph = ControlFlowGraph(self.program, self.entries, interprocedural=False)
+        loops = graph.loops()
+        headers = {loop.header for loop in loops}
+        back_edges = {(latch, loop.header) for loop in loops for latch in loop.latches}
+        call_edges = set()
+        for b, callee, return_pc in self.calls:
+            callee_block = self._block(callee)
+            if self.interprocedural and callee_block is not None:
+                call_edges.add((b, callee_block))
+        lines = [f"digraph {name} {{", '    node [shape=box, fontname="monospace"];']
+        cluster = None
+        for b, (start, end) in enumerate(zip(self.starts, self.ends)):
+            function = self.function_of(start)
+            if function != cluster:
+                if cluster is not None:
+                    lines.append("    }")
+                lines.append(f"    subgraph cluster_{function} {{")
+                lines.append(f'        label="{functions.get(function, function)}";')
+                cluster = function
+            if instructions:
+                label = "".join(f"{pc}: {format_instruction(self.program[pc])}\\l" for pc in range(start, end))
+            else:
+                label = f"{start}..{end - 1}"
+            style = ", penwidth=2" if b in headers else ""
+            lines.append(f'    {"    " if cluster is not None else ""}b{b} [label="{label}"{style}];')
+        if cluster is not None:
+            lines.append("    }")
+        for b, successors in enumerate(self.successors):
+            for s in successors:
+                if (b, s) in back_edges:
+                    style = " [color=red]"
+                elif (b, s) in call_edges or self.interprocedural and self.is_return(b):
+                    style = " [style=dashed]"
+                else:
+                    style = ""
+                lines.append(f"    b{b} -> b{s}{style};")
+        lines.append("}")
+        return "\n".join(lines) + "\n"
@@ -6,63 +6,24 @@ Date:               1 April 2020
 '''
 
 import os
-from scanner import SymbolTableManager
+from c_backend import CBackend
+from cfg import ControlFlowGraph
+from optimizer import fold_constants, peephole, allocate_temps
+from ir import Instruction, Operand, opcode_to_id, direct, immediate, indirect, code_address, format_program, \
+               ASSIGN, SUB, ADD, MULT, JP, JPF, PRINT
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-class MemoryManager(object):
-    ''' Manages shared information about memory locations '''
-
-    @classmethod
-    def init(cls):
-        cls.static_base_ptr = 1000
-        cls.temp_base_ptr   = 5000
-        cls.stack_base_ptr  = 10008
-
-        cls.static_offset   = 0
-        cls.temp_offset     = 0
-
-        cls.args_field_offset   = 4
-        cls.locals_field_offset = 0
-        cls.arrays_field_offset = 0
-        cls.temps_field_offset  = 0
-
-        cls.pb_index = 0  # program block index
-
-
-    @classmethod
-    def reset(cls):
-        ''' call this when finished creating stack frame '''
-        cls.args_field_offset  = 4
-        cls.locals_field_offset = 0
-        cls.array_field_offset = 0
-        cls.temp_field_offset  = 0
-
-
-    @classmethod
-    def get_temp(cls):
-        temp = cls.temp_base_ptr + cls.temp_offset
-        cls.temp_offset += 4
-        SymbolTableManager.temp_stack[-1] += 4
-        return temp 
-
-
-    @classmethod
-    def get_static(cls, arity=1):
-        temp = cls.static_base_ptr + cls.static_offset
-        cls.static_offset += 4 * arity
-        return temp
-
-
-    @classmethod
-    def get_param_offset(cls, arity=1):
-        offset = cls.args_field_offset
-        cls.args_field_offset += 4
-        return offset
-
-
 class CodeGen(object):
-    def __init__(self):
+    def __init__(self, context, opt_level=0):
+        self.context = context
+        self.opt_level = opt_level
+        self.removed_instructions = 0 # by the optimization passes
+        self.temp_peaks = {} # peak number of live temporaries by function name, set by optimize
+        self.function_entries = {} # entry instruction by function name, set by finish_program_routine
+        self.temps_error = None # overflow of the temporaries into the stack, set by finish_program_routine
+        self.symbol_table_manager = context.symbol_table_manager
+        self.memory_manager = context.memory_manager
         self.semantic_stack = []
         self.call_seq_stack = []
         self.cont_label_stack = []
@@ -112,128 +73,148 @@ class CodeGen(object):
         }
 
         self.program_block = []
+        self.const_pool = {} # constant value -> static address holding it
 
-        self.output_file = os.path.join(os.path.dirname(script_dir), "output", "output.txt")
+        self.output_file = context.output_path("output.txt")
+        self.c_output_file = context.output_path("output.c")
+        self.cfg_output_file = context.output_path("cfg.dot")
 
     
     @property
     def stack_frame_ptr_addr(self):
         ''' memory location for runtime stack frame pointer variable '''
-        return MemoryManager.static_base_ptr
+        return self.memory_manager.static_base_ptr
 
 
     @property
     def print_addr(self):
-        return MemoryManager.static_base_ptr + 4
+        return self.memory_manager.static_base_ptr + 4
 
 
     @property
     def arg_counter(self):
-        return [len(l) for l in SymbolTableManager.arg_list_stack]
+        return [len(l) for l in self.symbol_table_manager.arg_list_stack]
 
 
     def _add_three_addr_code(self, three_addr_code, idx=None, insert=False, increment=True):
+        ''' adds an instruction (None for a placeholder) to the program block '''
         if idx is None:
-            idx = MemoryManager.pb_index
-        if isinstance(three_addr_code, tuple):
-            three_addr_code = self._get_three_addr_code(three_addr_code[0], *three_addr_code[1:])
+            idx = self.memory_manager.pb_index
         if insert:
-            self.program_block[idx] = (idx, three_addr_code)
+            self.program_block[idx] = three_addr_code
         else:
-            self.program_block.append((idx, three_addr_code))
+            self.program_block.append(three_addr_code)
         if increment:
-            MemoryManager.pb_index += 1
+            self.memory_manager.pb_index += 1
 
 
     def _add_placeholder(self):
-        self._add_three_addr_code("PLACEHOLDER")
+        self._add_three_addr_code(None)
 
     
     def _add_print_code(self, t):
-        self._add_three_addr_code(self._get_three_addr_code("print", t))
+        self._add_three_addr_code(self._get_three_addr_code(PRINT, t))
 
     
     def _get_three_addr_code(self, opcode, *args):
-        three_addr_code = "(" + opcode.upper()
-        for i in range(3):
-            try:
-                arg = args[i]
-                three_addr_code = three_addr_code + ", " + str(arg)
-            except IndexError:
-                three_addr_code = three_addr_code + ", "
-        return three_addr_code + ")"
+        ''' returns an instruction of opcode (or its name), integer arguments
+            are direct addresses and the rest are operands '''
+        if isinstance(opcode, str):
+            opcode = opcode_to_id[opcode.upper()]
+        return Instruction(opcode, *[direct(arg) if isinstance(arg, int) else arg for arg in args])
 
 
     def _get_context_info(self):
-        scope_stack = SymbolTableManager.scope_stack
-        symbol_table = SymbolTableManager.symbol_table
+        scope_stack = self.symbol_table_manager.scope_stack
+        symbol_table = self.symbol_table_manager.symbol_table
         return scope_stack, symbol_table
 
 
     def _get_enclosing_fun(self, level=1):
         try:
-            scope_stack = SymbolTableManager.scope_stack
-            symbol_table = SymbolTableManager.symbol_table
+            scope_stack = self.symbol_table_manager.scope_stack
+            symbol_table = self.symbol_table_manager.symbol_table
             return symbol_table[scope_stack[-level] - 1]
         except IndexError:
             return None
 
 
     def _get_add_code(self, *args):
-        return self._get_three_addr_code("ADD", *args)
+        return self._get_three_addr_code(ADD, *args)
 
     
     def _get_sub_code(self, *args):
-        return self._get_three_addr_code("SUB", *args)
+        return self._get_three_addr_code(SUB, *args)
 
     
     def _get_static_addr(self, offset):
-        return MemoryManager.static_base_ptr + offset
+        return self.memory_manager.static_base_ptr + offset
 
     
-    def _resolve_addr(self, operand):
-        if isinstance(operand, int):
-            addr = operand
+    def _get_const_addr(self, value):
+        ''' returns the static address of a constant pool cell holding value,
+            the pool is initialized before main is called '''
+        addr = self.const_pool.get(value)
+        if addr is None:
+            addr = self.const_pool[value] = self.memory_manager.get_static()
+        return addr
+
+
+    def _resolve_addr(self, operand, store=False):
+        ''' constants resolve into immediate operands, unless the operand
+            is stored into (store=True) which needs a memory address '''
+        if isinstance(operand, Operand):
+            addr = direct(self._get_const_addr(operand.value)) if store else operand
+        elif isinstance(operand, int):
+            addr = direct(operand)
         elif "address" in operand:
-            addr = operand["address"] # static address
+            addr = direct(operand["address"]) # static address
         else:
             # need to calculate dynamic address
-            t_arg_addr = MemoryManager.get_temp()
-            self._add_three_addr_code(self._get_add_code(self.stack_frame_ptr_addr, f"#{operand['offset']}", t_arg_addr))
-            addr = f"@{t_arg_addr}"
+            t_arg_addr = self.memory_manager.get_temp()
+            self._add_three_addr_code(self._get_add_code(self.stack_frame_ptr_addr, immediate(operand['offset']), t_arg_addr))
+            addr = indirect(t_arg_addr)
         return addr
 
 
     def save_output(self):
-        with open(self.output_file, "w") as f:
-            if self.program_block:
-                for lineno, three_addr_code in self.program_block:
-                    f.write(f"{lineno}\t{three_addr_code}\n")
-            else:
-                f.write("Failed to generate output program.\n")
+        if self.program_block:
+            output = format_program(self.program_block)
+        else:
+            output = "Failed to generate output program.\n"
+        self.context.write(self.output_file, output)
+
+
+    def save_c_output(self):
+        ''' lowers the program block into a C source file '''
+        self.context.write(self.c_output_file, CBackend(self.program_block).to_c())
+
+
+    def save_cfg(self):
+        ''' writes the control flow graph of the program block
+            in the Graphviz dot language '''
+        graph = ControlFlowGraph(self.program_block, self.function_entries)
+        self.context.write(self.cfg_output_file, graph.to_dot())
 
 
     ''' semantic routines begin here '''
 
 
     def push_const_routine(self, input_token):
-        addr = MemoryManager.get_static()
-        const = "#" + input_token[1]
-        self._add_three_addr_code(self._get_three_addr_code("assign", const, addr))
-        self.semantic_stack.append(addr)
+        self.semantic_stack.append(immediate(int(input_token[1])))
 
 
     def push_id_routine(self, input_token):
-        id_row = SymbolTableManager.symbol_table[input_token[1]]
+        id_row = self.symbol_table_manager.symbol_table[input_token[1]]
         self.semantic_stack.append(id_row)
 
     
     def init_program_routine(self, input_token):
-        three_addr_code = self._get_three_addr_code("assign", f"#{MemoryManager.stack_base_ptr}", 
-                                  self.stack_frame_ptr_addr)
+        three_addr_code = self._get_three_addr_code(ASSIGN, immediate(self.memory_manager.stack_base_ptr),
+                                                    self.stack_frame_ptr_addr)
         self._add_three_addr_code(three_addr_code)
         # allocate space for stack ptr and print address (+0 and +4)
-        MemoryManager.static_offset += 8
+        self.memory_manager.static_offset += 8
         for _ in range(3):
             self._add_placeholder()
         
@@ -241,8 +222,8 @@ class CodeGen(object):
     def assign_routine(self, input_token):
         try:
             A = self._resolve_addr(self.semantic_stack.pop())
-            R = self._resolve_addr(self.semantic_stack[-1])
-            self._add_three_addr_code(("assign", A, R))
+            R = self._resolve_addr(self.semantic_stack[-1], store=True)
+            self._add_three_addr_code(self._get_three_addr_code(ASSIGN, A, R))
         except IndexError:
             pass
 
@@ -253,7 +234,7 @@ class CodeGen(object):
 
 
     def mult_routine(self, input_token):
-        self.binary_op_routine("MULT")
+        self.binary_op_routine(MULT)
 
 
     def relop_routine(self, input_token):
@@ -274,10 +255,10 @@ class CodeGen(object):
 
     def binary_op_routine(self, op):
         try:
-            R = MemoryManager.get_temp()
+            R = self.memory_manager.get_temp()
             A2 = self._resolve_addr(self.semantic_stack.pop())
             A1 = self._resolve_addr(self.semantic_stack.pop())
-            self._add_three_addr_code((op, A1, A2, R))
+            self._add_three_addr_code(self._get_three_addr_code(op, A1, A2, R))
             self.semantic_stack.append(R)
         except IndexError:
             pass
@@ -285,10 +266,46 @@ class CodeGen(object):
 
     def finish_program_routine(self, input_token):
         # back patch main jump here
-        t_ret_addr = MemoryManager.get_temp()
-        self.program_block[1] = (1, self._get_sub_code(self.stack_frame_ptr_addr, "#4", t_ret_addr))
-        self.program_block[2] = (2, self._get_three_addr_code("assign", f"#{MemoryManager.pb_index}", f"@{t_ret_addr}"))
-        self.program_block[3] = (3, self._get_three_addr_code("jp", SymbolTableManager.findrow("main")["address"]))
+        t_ret_addr = self.memory_manager.get_temp()
+        main_addr = self.symbol_table_manager.findrow("main")["address"]
+        if self.const_pool:
+            # initialize the constant pool on the way to main
+            pool_idx = self.memory_manager.pb_index
+            for value, addr in self.const_pool.items():
+                self._add_three_addr_code(self._get_three_addr_code(ASSIGN, immediate(value), addr))
+            self._add_three_addr_code(self._get_three_addr_code(JP, main_addr))
+            main_addr = pool_idx
+        self.program_block[1] = self._get_sub_code(self.stack_frame_ptr_addr, immediate(4), t_ret_addr)
+        self.program_block[2] = self._get_three_addr_code(ASSIGN, code_address(self.memory_manager.pb_index), indirect(t_ret_addr))
+        self.program_block[3] = self._get_three_addr_code(JP, main_addr)
+        self.function_entries = {row["lexim"] : row["address"] for row in self.symbol_table_manager.symbol_table
+                                 if row.get("role") == "function" and "address" in row}
+        if self.opt_level:
+            self.optimize()
+        temps_end = self.memory_manager.temp_base_ptr + self.memory_manager.temp_offset
+        if temps_end > self.memory_manager.stack_base_ptr - 8:
+            # reported as a semantic error by the parser, see SemanticAnalyser.temps_check
+            self.temps_error = (f"Temporaries up to address {temps_end} overlap the runtime stack at "
+                                f"{self.memory_manager.stack_base_ptr - 8}" +
+                                (", compile with -O1 to reuse them" if not self.opt_level else ""))
+
+
+    def optimize(self):
+        ''' runs the optimization passes of opt_level on the finished program block,
+            level 1 and above also packs the temporaries into reused slots '''
+        size = len(self.program_block)
+        temp_base_ptr = self.memory_manager.temp_base_ptr
+        temps = range(temp_base_ptr, temp_base_ptr + self.memory_manager.temp_offset)
+        labels = self.function_entries # relocated by the passes
+        if self.opt_level >= 1:
+            self.program_block = fold_constants(self.program_block, temps, labels)
+        if self.opt_level >= 2:
+            self.program_block = peephole(self.program_block, temps, labels=labels)
+        if self.opt_level >= 1:
+            self.program_block, slots, self.temp_peaks = allocate_temps(self.program_block, temps, temp_base_ptr, labels)
+            self.memory_manager.temp_offset = 4 * slots
+        self.memory_manager.pb_index = len(self.program_block)
+        self.removed_instructions += size - len(self.program_block)
 
 
     def call_seq_caller_routine(self, input_token, backpatch=False):
@@ -304,77 +321,80 @@ class CodeGen(object):
 
         if backpatch:
             callee = stack.pop()
-            store_idx = MemoryManager.pb_index
+            store_idx = self.memory_manager.pb_index
             t_ret_val = stack.pop()
             self.arg_counter[-1] = stack.pop()
-            MemoryManager.pb_index = stack.pop()
+            self.memory_manager.pb_index = stack.pop()
         else:
             callee = stack[-(self.arg_counter[-1] + 1)]
         
-        caller = SymbolTableManager.get_enclosing_fun()
+        caller = self.symbol_table_manager.get_enclosing_fun()
 
         if callee["lexim"] == "output":
             arg = stack.pop()
             stack.pop() # pop output row off the stack
             arg_addr = self._resolve_addr(arg)
-            self._add_three_addr_code(self._get_three_addr_code("assign", arg_addr, self.print_addr))
-            self._add_three_addr_code(self._get_three_addr_code("PRINT", self.print_addr))
+            if isinstance(arg, Operand):
+                self._add_three_addr_code(self._get_three_addr_code(PRINT, arg_addr)) # print constant directly
+            else:
+                self._add_three_addr_code(self._get_three_addr_code(ASSIGN, arg_addr, self.print_addr))
+                self._add_three_addr_code(self._get_three_addr_code(PRINT, self.print_addr))
             self.arg_counter[-1] = 0
             self.semantic_stack.append("void")
             return
 
         if not backpatch:
-            t_ret_val = MemoryManager.get_temp()
+            t_ret_val = self.memory_manager.get_temp()
         
         if "frame_size" in caller:
             # current top_sp and access link pointer
             top_sp = self.stack_frame_ptr_addr
             frame_size = caller["frame_size"]
-            t_new_top_sp = MemoryManager.get_temp()
-            self._add_three_addr_code(self._get_add_code(top_sp, f"#{frame_size}", t_new_top_sp), insert=backpatch)
+            t_new_top_sp = self.memory_manager.get_temp()
+            self._add_three_addr_code(self._get_add_code(top_sp, immediate(frame_size), t_new_top_sp), insert=backpatch)
             # assign access link address to new stack frame
-            self._add_three_addr_code(self._get_three_addr_code("assign", top_sp, f"@{t_new_top_sp}"), insert=backpatch)
-            t_args = MemoryManager.get_temp()
-            self._add_three_addr_code(self._get_add_code(t_new_top_sp, "#4", t_args), insert=backpatch)
+            self._add_three_addr_code(self._get_three_addr_code(ASSIGN, top_sp, indirect(t_new_top_sp)), insert=backpatch)
+            t_args = self.memory_manager.get_temp()
+            self._add_three_addr_code(self._get_add_code(t_new_top_sp, immediate(4), t_args), insert=backpatch)
             n_args = callee["arity"]
             args = stack[-n_args:]
             for i in range(n_args):
                 stack.pop()
                 arg = args[i]
-                if isinstance(arg, int):
-                    arg_addr = arg
+                if isinstance(arg, (int, Operand)):
+                    arg_addr = arg # temporary or constant
                 elif "address" in arg:
                     arg_addr = arg["address"]  # static address
                 else:
                     # need to calculate dynamic address
-                    t_arg_addr = MemoryManager.get_temp()
-                    self._add_three_addr_code(self._get_add_code(self.stack_frame_ptr_addr, f"#{arg['offset']}", t_arg_addr), 
+                    t_arg_addr = self.memory_manager.get_temp()
+                    self._add_three_addr_code(self._get_add_code(self.stack_frame_ptr_addr, immediate(arg['offset']), t_arg_addr), 
                                               insert=backpatch)
-                    arg_addr = f"@{t_arg_addr}"
+                    arg_addr = indirect(t_arg_addr)
                 if callee["params"][-i-1] == "array":
-                    arg_addr = f"#{arg}" # pass by reference
-                self._add_three_addr_code(self._get_three_addr_code("assign", arg_addr, f"@{t_args}"), insert=backpatch)
-                self._add_three_addr_code(self._get_add_code(t_args, "#4", t_args), insert=backpatch)
+                    arg_addr = immediate(arg) # pass by reference
+                self._add_three_addr_code(self._get_three_addr_code(ASSIGN, arg_addr, indirect(t_args)), insert=backpatch)
+                self._add_three_addr_code(self._get_add_code(t_args, immediate(4), t_args), insert=backpatch)
             fun_addr = stack.pop()["address"] 
             # put pointers for return address and return value in temp variables 
-            t_ret_addr = MemoryManager.get_temp()
-            t_ret_val_callee = MemoryManager.get_temp()
-            self._add_three_addr_code(self._get_sub_code(t_new_top_sp, "#4", t_ret_addr), insert=backpatch)
-            self._add_three_addr_code(self._get_sub_code(t_new_top_sp, "#8", t_ret_val_callee), insert=backpatch)
+            t_ret_addr = self.memory_manager.get_temp()
+            t_ret_val_callee = self.memory_manager.get_temp()
+            self._add_three_addr_code(self._get_sub_code(t_new_top_sp, immediate(4), t_ret_addr), insert=backpatch)
+            self._add_three_addr_code(self._get_sub_code(t_new_top_sp, immediate(8), t_ret_val_callee), insert=backpatch)
             # increment stack frame pointer by frame size TODO: update stack pointer via access link and static offset
-            # self._add_three_addr_code(self._get_add_code(top_sp, f"#{frame_size}", top_sp), insert=backpatch)
-            self._add_three_addr_code(self._get_three_addr_code("assign", t_new_top_sp, top_sp), insert=backpatch)
-            # self._add_three_addr_code(self._get_three_addr_code("print", top_sp), insert=backpatch)
+            # self._add_three_addr_code(self._get_add_code(top_sp, immediate(frame_size), top_sp), insert=backpatch)
+            self._add_three_addr_code(self._get_three_addr_code(ASSIGN, t_new_top_sp, top_sp), insert=backpatch)
+            # self._add_three_addr_code(self._get_three_addr_code(PRINT, top_sp), insert=backpatch)
             # assign value for return address in callee stack frame
-            self._add_three_addr_code(self._get_three_addr_code("assign", f"#{MemoryManager.pb_index + 2}", f"@{t_ret_addr}"), 
+            self._add_three_addr_code(self._get_three_addr_code(ASSIGN, code_address(self.memory_manager.pb_index + 2), indirect(t_ret_addr)), 
                                       insert=backpatch)
             # jump to function address
-            self._add_three_addr_code(self._get_three_addr_code("jp", fun_addr), insert=backpatch)
+            self._add_three_addr_code(self._get_three_addr_code(JP, fun_addr), insert=backpatch)
             # fetch the return value to a temporary and push it to the stack
-            self._add_three_addr_code(self._get_three_addr_code("assign", f"@{t_ret_val_callee}", t_ret_val), insert=backpatch)
+            self._add_three_addr_code(self._get_three_addr_code(ASSIGN, indirect(t_ret_val_callee), t_ret_val), insert=backpatch)
             # decrement stack frame pointer by frame size
-            self._add_three_addr_code(self._get_sub_code(top_sp, f"#{frame_size}", top_sp), insert=backpatch)
-            # self._add_three_addr_code(self._get_three_addr_code("print", top_sp), insert=backpatch)
+            self._add_three_addr_code(self._get_sub_code(top_sp, immediate(frame_size), top_sp), insert=backpatch)
+            # self._add_three_addr_code(self._get_three_addr_code(PRINT, top_sp), insert=backpatch)
         else: # in recursive calls we need to backpatch
             callee = stack[-(self.arg_counter[-1] + 1)]
             self.call_seq_stack += self.semantic_stack[-(self.arg_counter[-1] + 1):]
@@ -384,7 +404,7 @@ class CodeGen(object):
                 if not isinstance(arg, int) and "offset" in arg:
                     num_offset_vars += 1
             self.semantic_stack = self.semantic_stack[:-(self.arg_counter[-1] + 1)]
-            self.call_seq_stack.append(MemoryManager.pb_index)
+            self.call_seq_stack.append(self.memory_manager.pb_index)
             self.call_seq_stack.append(self.arg_counter[-1])
             self.call_seq_stack.append(t_ret_val)
             self.call_seq_stack.append(callee)
@@ -393,7 +413,7 @@ class CodeGen(object):
                 self._add_placeholder()
 
         if backpatch:
-            MemoryManager.pb_index = store_idx
+            self.memory_manager.pb_index = store_idx
         else:
             if callee["type"] == "void":
                 self.semantic_stack.append("void")
@@ -409,13 +429,13 @@ class CodeGen(object):
         ''' Calculates size of callee's stack frame and local variable field 
             and stores it into symbol table '''
         scope_stack, symbol_table = self._get_context_info()
-        fun_row = SymbolTableManager.get_enclosing_fun()
+        fun_row = self.symbol_table_manager.get_enclosing_fun()
         fun_row["args_size"] = 0
         fun_row["locals_size"] = 0
         fun_row["arrays_size"] = 0
-        fun_row["temps_size"] = SymbolTableManager.temp_stack.pop()
-        if not SymbolTableManager.temp_stack:
-            SymbolTableManager.temp_stack = [0]
+        fun_row["temps_size"] = self.symbol_table_manager.temp_stack.pop()
+        if not self.symbol_table_manager.temp_stack:
+            self.symbol_table_manager.temp_stack = [0]
         for i in range(scope_stack[-1], len(symbol_table)):
             if symbol_table[i]["role"] == "local_var":
                 if symbol_table[i]["type"] == "array":
@@ -435,30 +455,30 @@ class CodeGen(object):
         while self.call_seq_stack:
             self.call_seq_caller_routine(input_token, backpatch=True)
 
-        MemoryManager.reset()
+        self.memory_manager.reset()
 
     
     def set_retval_routine(self, input_token):
         # save return value address into temp variable
-        t = MemoryManager.get_temp()
-        self._add_three_addr_code(self._get_sub_code(self.stack_frame_ptr_addr, "#8", t))
+        t = self.memory_manager.get_temp()
+        self._add_three_addr_code(self._get_sub_code(self.stack_frame_ptr_addr, immediate(8), t))
         try:
             retval_addr = self._resolve_addr(self.semantic_stack.pop())
         except IndexError:
-            ta_code = self._get_three_addr_code("assign", "#0", f"@{t}")
+            ta_code = self._get_three_addr_code(ASSIGN, immediate(0), indirect(t))
             self._add_three_addr_code(ta_code)
         else:
-            ta_code = self._get_three_addr_code("assign", retval_addr, f"@{t}")
+            ta_code = self._get_three_addr_code(ASSIGN, retval_addr, indirect(t))
             self._add_three_addr_code(ta_code)
 
 
     def return_seq_callee_routine(self, input_token):
-        t = MemoryManager.get_temp()
+        t = self.memory_manager.get_temp()
         # save return address into temp variable
-        self._add_three_addr_code(self._get_sub_code(self.stack_frame_ptr_addr, "#4", t))
-        t2 = MemoryManager.get_temp()
-        self._add_three_addr_code(self._get_three_addr_code("assign", f"@{t}", t2))
-        self._add_three_addr_code(self._get_three_addr_code("jp", f"@{t2}"))
+        self._add_three_addr_code(self._get_sub_code(self.stack_frame_ptr_addr, immediate(4), t))
+        t2 = self.memory_manager.get_temp()
+        self._add_three_addr_code(self._get_three_addr_code(ASSIGN, indirect(t), t2))
+        self._add_three_addr_code(self._get_three_addr_code(JP, indirect(t2)))
     
 
     def close_stmt_routine(self, input_token):
@@ -467,11 +487,11 @@ class CodeGen(object):
 
     
     def label_routine(self, input_token):
-        self.semantic_stack.append(MemoryManager.pb_index)
+        self.semantic_stack.append(self.memory_manager.pb_index)
 
 
     def save_routine(self, input_token):
-        self.semantic_stack.append(MemoryManager.pb_index)
+        self.semantic_stack.append(self.memory_manager.pb_index)
         self._add_placeholder()
 
 
@@ -480,8 +500,8 @@ class CodeGen(object):
             saved_idx = self.semantic_stack.pop()
             cond = self._resolve_addr(self.semantic_stack.pop())
             jp_target = self.semantic_stack.pop()
-            self._add_three_addr_code(("jp", jp_target))
-            self._add_three_addr_code(("jpf", cond, MemoryManager.pb_index), 
+            self._add_three_addr_code(self._get_three_addr_code(JP, jp_target))
+            self._add_three_addr_code(self._get_three_addr_code(JPF, cond, self.memory_manager.pb_index),
                                       idx=saved_idx, insert=True, increment=False)
         except IndexError:
             pass
@@ -490,31 +510,31 @@ class CodeGen(object):
             self.cont_label_stack.pop()
             break_locs = self.break_loc_stack.pop()
             for bloc in break_locs:
-                self._add_three_addr_code(("jp", MemoryManager.pb_index), 
-                                           idx=bloc, insert=True, increment=False)
+                self._add_three_addr_code(self._get_three_addr_code(JP, self.memory_manager.pb_index),
+                                          idx=bloc, insert=True, increment=False)
         except IndexError:
             pass
         
 
     def init_while_stacks_routine(self, input_token):
-        self.cont_label_stack.append(MemoryManager.pb_index)
+        self.cont_label_stack.append(self.memory_manager.pb_index)
         self.break_loc_stack.append([])
 
 
     def cont_jp_routine(self, input_token):
-        self._add_three_addr_code(("jp", self.cont_label_stack[-1]))
+        self._add_three_addr_code(self._get_three_addr_code(JP, self.cont_label_stack[-1]))
 
 
     def break_jp_save_routine(self, input_token):
-        self.break_loc_stack[-1].append(MemoryManager.pb_index)
+        self.break_loc_stack[-1].append(self.memory_manager.pb_index)
         self._add_placeholder()
 
 
     def if_else_routine(self, input_token):
         try:
             saved_idx = self.semantic_stack.pop()
-            self._add_three_addr_code(("jp", MemoryManager.pb_index), 
-                                        idx=saved_idx, insert=True, increment=False)
+            self._add_three_addr_code(self._get_three_addr_code(JP, self.memory_manager.pb_index),
+                                      idx=saved_idx, insert=True, increment=False)
         except IndexError:
             pass
 
@@ -523,10 +543,10 @@ class CodeGen(object):
         try:
             saved_idx = self.semantic_stack.pop()
             cond = self._resolve_addr(self.semantic_stack.pop())
-            self.semantic_stack.append(MemoryManager.pb_index)
+            self.semantic_stack.append(self.memory_manager.pb_index)
             self._add_placeholder()
-            self._add_three_addr_code(("jpf", cond, MemoryManager.pb_index), 
-                                        idx=saved_idx, insert=True, increment=False)
+            self._add_three_addr_code(self._get_three_addr_code(JPF, cond, self.memory_manager.pb_index),
+                                      idx=saved_idx, insert=True, increment=False)
         except IndexError:
             pass
 
@@ -535,7 +555,7 @@ class CodeGen(object):
 
 
     def code_gen(self, action_symbol, input_token):
-        if not SymbolTableManager.error_flag:
+        if not self.symbol_table_manager.error_flag:
             try:
                 self.semantic_routines[action_symbol](input_token)
             except Exception as e:
@@ -0,0 +1,185 @@
+'''
+Compilation Context module of the Simple C Compiler
+
+Holds all the mutable state of a single compilation, so that
+multiple compilations can run in the same process concurrently
+'''
+
+import os
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class SymbolTableManager(object):
+    ''' Manages the symbol table of the compiler
+    which is used across modules '''
+    _global_funcs = [{
+        "lexim": "output",
+        "scope": 0,
+        "type": "void",
+        "role": "function",
+        "arity": 1,
+        "params": ["int"]
+    }]
+
+    def __init__(self):
+        self.init()
+
+    def init(self):
+        self.scope_stack = [0]
+        self.temp_stack = [0]
+        self.arg_list_stack = []
+        self.symbol_table = [dict(row) for row in self._global_funcs]
+        # symbol table is a stack of rows where each scope is a contiguous block of rows
+        # starting at scope_stack[scope], rows of a name are indexed by a stack of row
+        # indices so that the innermost declaration is always on top of the stack
+        self.name_to_rows = {}
+        for i, row in enumerate(self.symbol_table):
+            self.name_to_rows.setdefault(row["lexim"], []).append(i)
+        self.declaration_flag = False
+        self.error_flag = False
+
+    def scope(self):
+        return len(self.scope_stack) - 1
+
+    def insert(self, lexim):
+        self.name_to_rows.setdefault(lexim, []).append(len(self.symbol_table))
+        self.symbol_table.append({"lexim" : lexim, "scope" : self.scope()})
+
+    def push_scope(self):
+        self.scope_stack.append(len(self.symbol_table))
+
+    def pop_scope(self):
+        ''' removes the rows of the innermost scope from the symbol table '''
+        scope_start_idx = self.scope_stack.pop()
+        for row in reversed(self.symbol_table[scope_start_idx:]):
+            rows = self.name_to_rows[row["lexim"]]
+            rows.pop()
+            if not rows:
+                del self.name_to_rows[row["lexim"]]
+        del self.symbol_table[scope_start_idx:]
+
+    def _exists(self, lexim, scope):
+        for i in self.name_to_rows.get(lexim, ()):
+            if self.symbol_table[i]["scope"] == scope:
+                return True
+        return False
+
+    def findrow(self, value, attr="lexim"):
+        i = self.findrow_idx(value, attr)
+        return self.symbol_table[i] if i is not None else None
+
+    def findrow_idx(self, value, attr="lexim"):
+        if attr == "lexim":
+            rows = self.name_to_rows.get(value)
+            return rows[-1] if rows else None
+        for i in range(len(self.symbol_table) - 1, -1, -1):
+            row = self.symbol_table[i]
+            if row[attr] == value:
+                return i
+        return None
+
+    def install_id(self, lexim):
+        if not self.declaration_flag:
+            i = self.findrow_idx(lexim)
+            if i is not None:
+                return i
+        return len(self.symbol_table)
+
+    def get_enclosing_fun(self, level=1):
+        try:
+            return self.symbol_table[self.scope_stack[-level] - 1]
+        except IndexError:
+            return None
+
+
+class MemoryManager(object):
+    ''' Manages shared information about memory locations '''
+
+    def __init__(self, symbol_table_manager):
+        self.symbol_table_manager = symbol_table_manager
+        self.init()
+
+
+    def init(self):
+        self.static_base_ptr = 1000
+        self.temp_base_ptr   = 5000
+        self.stack_base_ptr  = 10008
+
+        self.static_offset   = 0
+        self.temp_offset     = 0
+
+        self.args_field_offset   = 4
+        self.locals_field_offset = 0
+        self.arrays_field_offset = 0
+        self.temps_field_offset  = 0
+
+        self.pb_index = 0  # program block index
+
+
+    def reset(self):
+        ''' call this when finished creating stack frame '''
+        self.args_field_offset  = 4
+        self.locals_field_offset = 0
+        self.array_field_offset = 0
+        self.temp_field_offset  = 0
+
+
+    def get_temp(self):
+        temp = self.temp_base_ptr + self.temp_offset
+        self.temp_offset += 4
+        self.symbol_table_manager.temp_stack[-1] += 4
+        return temp
+
+
+    def get_static(self, arity=1):
+        temp = self.static_base_ptr + self.static_offset
+        self.static_offset += 4 * arity
+        return temp
+
+
+    def get_param_offset(self, arity=1):
+        offset = self.args_field_offset
+        self.args_field_offset += 4
+        return offset
+
+
+class CompilationContext(object):
+    ''' State of one compilation: symbol table, memory layout and the
+        destinations of the output files. Output files are written into
+        output_dir and errors_dir, or with in_memory=True only into the
+        files dictionary keyed by file name '''
+
+    def __init__(self, output_dir=None, errors_dir=None, in_memory=False):
+        self.symbol_table_manager = SymbolTableManager()
+        self.memory_manager = MemoryManager(self.symbol_table_manager)
+        self.output_dir = output_dir or os.path.join(script_dir, "output")
+        self.errors_dir = errors_dir or os.path.join(script_dir, "errors")
+        self.in_memory = in_memory
+        self.files = {}
+
+
+    @property
+    def error_flag(self):
+        return self.symbol_table_manager.error_flag
+
+
+    def output_path(self, file_name):
+        return os.path.join(self.output_dir, file_name)
+
+
+    def errors_path(self, file_name):
+        return os.path.join(self.errors_dir, file_name)
+
+
+    def write(self, file_path, text):
+        ''' writes text, or an iterable of lines which is written as it
+            is consumed, into an output file or its in-memory sink '''
+        if self.in_memory:
+            self.files[os.path.basename(file_path)] = text if isinstance(text, str) else "".join(text)
+        else:
+            with open(file_path, "w", encoding="utf-8") as f:
+                if isinstance(text, str):
+                    f.write(text)
+                else:
+                    f.writelines(text)
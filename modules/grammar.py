@@ -0,0 +1,323 @@
+'''
+Grammar module of the Simple C Compiler
+
+Generates the LL(1) parsing table of the parser and the equivalent
+recursive descent parser from the grammar specification file
+(grammar_specs/grammar_with_action_symbols.txt)
+
+The generated tables are cached next to the grammar file, keyed by the
+hash of the grammar, so they are only computed when the grammar changes
+'''
+
+import os
+import marshal
+import hashlib
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+grammar_file = os.path.join(script_dir, "grammar_specs", "grammar_with_action_symbols.txt")
+
+# symbol kinds
+TERMINAL, NON_TERMINAL, SA_ACTION, CG_ACTION = range(4)
+
+# parsing table entries for errors: pop the non-terminal or skip the input token
+SYNCH = -1
+EMPTY = -2
+
+EPSILON = "EPSILON"
+EOF = "$"
+
+CACHE_VERSION = 2
+
+
+def read_grammar(grammar_file):
+    ''' returns the productions of the grammar as (non-terminal, rhs) pairs
+        in the order of the grammar file, the first non-terminal is the start symbol '''
+    productions = []
+    with open(grammar_file, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                lhs, rhs = line.split("->")
+            except ValueError:
+                raise RuntimeError(f"{grammar_file}:{lineno}: expected a production 'A -> ...'")
+            for alternative in rhs.split("|"):
+                productions.append((lhs.strip(), alternative.split()))
+    return productions
+
+
+def is_action_symbol(symbol):
+    return symbol.startswith("#")
+
+
+def compute_first_sets(productions, non_terminals):
+    ''' FIRST set of each non-terminal, action symbols derive the empty string '''
+    first = {A : set() for A in non_terminals}
+    changed = True
+    while changed:
+        changed = False
+        for A, rhs in productions:
+            symbols_first = first_of_symbols(rhs, first)
+            if not symbols_first <= first[A]:
+                first[A] |= symbols_first
+                changed = True
+    return first
+
+
+def first_of_symbols(symbols, first):
+    ''' FIRST set of a string of grammar symbols '''
+    result = set()
+    for symbol in symbols:
+        if symbol == EPSILON or is_action_symbol(symbol):
+            continue
+        if symbol not in first: # terminal
+            result.add(symbol)
+            return result
+        result |= first[symbol] - {EPSILON}
+        if EPSILON not in first[symbol]:
+            return result
+    result.add(EPSILON)
+    return result
+
+
+def compute_follow_sets(productions, non_terminals, first):
+    follow = {A : set() for A in non_terminals}
+    follow[productions[0][0]].add(EOF)
+    changed = True
+    while changed:
+        changed = False
+        for A, rhs in productions:
+            for i, symbol in enumerate(rhs):
+                if symbol not in follow:
+                    continue
+                rest_first = first_of_symbols(rhs[i + 1:], first)
+                new = rest_first - {EPSILON}
+                if EPSILON in rest_first:
+                    new |= follow[A]
+                if not new <= follow[symbol]:
+                    follow[symbol] |= new
+                    changed = True
+    return follow
+
+
+def generate_tables(grammar_file=grammar_file):
+    ''' computes the LL(1) parsing table with SYNCH entries for panic mode error
+        recovery and lowers the grammar into integer symbol ids, see load_tables '''
+    productions = read_grammar(grammar_file)
+    non_terminals = []
+    for A, _ in productions:
+        if A not in non_terminals:
+            non_terminals.append(A)
+    terminals = []
+    for _, rhs in productions:
+        for symbol in rhs:
+            if symbol not in non_terminals and symbol not in terminals \
+               and symbol != EPSILON and not is_action_symbol(symbol):
+                terminals.append(symbol)
+    terminals.append(EOF)
+    terminal_to_col = {terminal : col for col, terminal in enumerate(terminals)}
+
+    first = compute_first_sets(productions, non_terminals)
+    follow = compute_follow_sets(productions, non_terminals, first)
+
+    table = {A : [EMPTY] * len(terminals) for A in non_terminals}
+    for prod_idx, (A, rhs) in enumerate(productions):
+        rhs_first = first_of_symbols(rhs, first)
+        lookaheads = rhs_first - {EPSILON}
+        if EPSILON in rhs_first:
+            lookaheads |= follow[A]
+        for a in lookaheads:
+            row = table[A]
+            if row[terminal_to_col[a]] != EMPTY:
+                other = productions[row[terminal_to_col[a]]][1]
+                raise RuntimeError(f"Grammar is not LL(1): {A} -> {' '.join(other)} and "
+                                   f"{A} -> {' '.join(rhs)} both predicted by {a}")
+            row[terminal_to_col[a]] = prod_idx
+    for A in non_terminals:
+        for a in follow[A] | {EOF}: # the end of file always pops a non-terminal
+            if table[A][terminal_to_col[a]] == EMPTY:
+                table[A][terminal_to_col[a]] = SYNCH
+
+    # grammar lowered into integer symbol ids: terminals are numbered by their
+    # parsing table column, followed by the non-terminals and the action symbols
+    symbols = terminals + non_terminals
+    for _, rhs in productions:
+        for symbol in rhs:
+            if is_action_symbol(symbol) and symbol not in symbols:
+                symbols.append(symbol)
+    symbol_to_id = {symbol : i for i, symbol in enumerate(symbols)}
+    symbol_kinds = [TERMINAL if symbol in terminal_to_col else
+                    NON_TERMINAL if symbol in table else
+                    SA_ACTION if symbol.startswith("#SA") else CG_ACTION for symbol in symbols]
+    tables = {
+        "version" : CACHE_VERSION,
+        "terminal_to_col" : terminal_to_col,
+        "non_terminal_to_row" : {A : row for row, A in enumerate(non_terminals)},
+        "parsing_table" : tuple(tuple(table[A]) for A in non_terminals),
+        "productions" : tuple(tuple(rhs) for _, rhs in productions),
+        "symbols" : tuple(symbols),
+        "symbol_kinds" : tuple(symbol_kinds),
+        # right hand sides as symbol ids in the order they are pushed to the parse stack
+        "production_ids" : tuple(tuple(symbol_to_id[symbol] for symbol in reversed(rhs) if symbol != EPSILON)
+                                 for _, rhs in productions),
+        # positions of the pushed symbols in the children of the parse tree node
+        "production_push_positions" : tuple(tuple(i for i in reversed(range(len(rhs))) if rhs[i] != EPSILON)
+                                            for _, rhs in productions),
+    }
+    tables["rd_parser_source"] = generate_rd_parser(tables)
+    return tables
+
+
+def generate_rd_parser(tables):
+    ''' generates the source code of a recursive descent parser with one function
+        per non-terminal, which makes exactly the same predictions, action calls
+        and panic mode error recovery as the table driven parser. The source
+        defines rd_parse(parser, next_token, token, line_number), which parses
+        the tokens and returns the line number of the end of the input '''
+    terminal_to_col = tables["terminal_to_col"]
+    productions = tables["productions"]
+    eof = terminal_to_col[EOF]
+
+    def function_name(A):
+        return "parse_" + A.replace("-", "_")
+
+    def lookahead_test(cols):
+        cols = sorted(cols)
+        if len(cols) == 1:
+            return f"a == {cols[0]}"
+        return f"a in {{{', '.join(str(col) for col in cols)}}}"
+
+    lines = [
+        "# generated from the grammar by grammar.generate_rd_parser, do not edit",
+        "",
+        "class UnexpectedEndOfFile(Exception):",
+        "    pass",
+        "",
+        "",
+        "def rd_parse(parser, next_token, token, line_number):",
+        "    syntax_errors = parser._syntax_errors",
+        "    symbol_table_manager = parser.symbol_table_manager",
+        "    scanner = parser.scanner",
+        "    semantic_check = parser.semantic_analyzer.semantic_check",
+        "    code_gen = parser.code_generator.code_gen",
+        "    a = terminal_to_col[token[0] if token[0] in ('ID', 'NUM') else token[1]]",
+        "",
+        "    def missing(X):",
+        "        symbol_table_manager.error_flag = True",
+        "        syntax_errors.append((line_number, f'Missing \"{X}\"'))",
+        "",
+        "    def synch(A):",
+        "        symbol_table_manager.error_flag = True",
+        f"        if a == {eof}:",
+        "            syntax_errors.append((line_number, 'Unexpected EndOfFile'))",
+        "            raise UnexpectedEndOfFile",
+        "        missing(non_terminal_to_missing_construct[A])",
+        "",
+        "    def illegal():",
+        "        nonlocal token, line_number, a",
+        "        symbol_table_manager.error_flag = True",
+        "        syntax_errors.append((line_number, f'Illegal \"{symbols[a]}\"'))",
+        "        token, line_number = next_token()",
+        "        a = terminal_to_col[token[0] if token[0] in ('ID', 'NUM') else token[1]]",
+    ]
+    for A, row in tables["non_terminal_to_row"].items():
+        entries = tables["parsing_table"][row]
+        lines += [
+            "",
+            f"    def {function_name(A)}():",
+            "        nonlocal token, line_number, a",
+            "        while True:",
+        ]
+        branch = "if"
+        for prod_idx in sorted(set(entries) - {SYNCH, EMPTY}):
+            lines.append(f"            {branch} {lookahead_test([col for col, entry in enumerate(entries) if entry == prod_idx])}:"
+                         f" # {A} -> {' '.join(productions[prod_idx])}")
+            branch = "elif"
+            body = []
+            rhs = [symbol for symbol in productions[prod_idx] if symbol != EPSILON]
+            predicted = True # the lookahead is known to match the first terminal
+            for i, symbol in enumerate(rhs):
+                if symbol == "#SA_DEC_SCOPE": # the scope of the lookahead ID changes
+                    body += [f"if a == {terminal_to_col['ID']}:",
+                             "    curr_lexim = scanner.id_to_lexim(token[1])",
+                             f"semantic_check('{symbol}', token, line_number)",
+                             f"if a == {terminal_to_col['ID']}:",
+                             "    token = (token[0], scanner.update_symbol_table(curr_lexim))"]
+                elif symbol.startswith("#SA"):
+                    body.append(f"semantic_check('{symbol}', token, line_number)")
+                elif is_action_symbol(symbol):
+                    body.append(f"code_gen('{symbol}', token)")
+                elif symbol in terminal_to_col and predicted:
+                    body += ["token, line_number = next_token()",
+                             "a = terminal_to_col[token[0] if token[0] in ('ID', 'NUM') else token[1]]"]
+                elif symbol in terminal_to_col:
+                    body += [f"if a == {terminal_to_col[symbol]}:",
+                             "    token, line_number = next_token()",
+                             "    a = terminal_to_col[token[0] if token[0] in ('ID', 'NUM') else token[1]]",
+                             "else:",
+                             f"    missing({symbol!r})"]
+                elif symbol == A and i == len(rhs) - 1:
+                    body.append("continue") # tail recursion is a loop
+                else:
+                    body.append(f"{function_name(symbol)}()")
+                if not is_action_symbol(symbol):
+                    predicted = False
+            if not body or body[-1] != "continue":
+                body.append("return")
+            lines += [f"                {line}" for line in body]
+        synch_cols = [col for col, entry in enumerate(entries) if entry == SYNCH]
+        if synch_cols:
+            lines += [f"            {branch} {lookahead_test(synch_cols)}:",
+                      f"                synch({A!r})",
+                      "                return"]
+        lines += ["            else:" if synch_cols or branch == "elif" else "            if True:",
+                  "                illegal()"]
+    start_symbol = next(iter(tables["non_terminal_to_row"]))
+    lines += [
+        "",
+        "    try:",
+        f"        {function_name(start_symbol)}()",
+        f"        if a != {eof}: # parse stack unexpectedly exhausted",
+        "            symbol_table_manager.error_flag = True",
+        "    except UnexpectedEndOfFile:",
+        "        pass",
+        "    return line_number",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def cache_file(grammar_file, grammar_hash):
+    name = os.path.splitext(os.path.basename(grammar_file))[0]
+    return os.path.join(os.path.dirname(grammar_file), "__pycache__", f"{name}.{grammar_hash[:16]}.marshal")
+
+
+def load_tables(grammar_file=grammar_file):
+    ''' returns the parsing tables of the grammar from the cache,
+        generating and caching them if the grammar has changed '''
+    with open(grammar_file, "rb") as f:
+        grammar_hash = hashlib.sha256(f.read()).hexdigest()
+    cached_file = cache_file(grammar_file, grammar_hash)
+    try:
+        with open(cached_file, "rb") as f:
+            tables = marshal.load(f)
+        if tables.get("version") == CACHE_VERSION:
+            return tables
+    except (OSError, EOFError, ValueError, TypeError, AttributeError):
+        pass
+    tables = generate_tables(grammar_file)
+    try:
+        os.makedirs(os.path.dirname(cached_file), exist_ok=True)
+        temp_file = f"{cached_file}.{os.getpid()}"
+        with open(temp_file, "wb") as f:
+            marshal.dump(tables, f)
+        os.replace(temp_file, cached_file) # concurrent compilers never see a partial cache
+    except OSError:
+        pass # read-only installation, the tables are generated on every run
+    return tables
+
+
+if __name__ == "__main__":
+    tables = generate_tables()
+    for A, row in tables["non_terminal_to_row"].items():
+        print(f"{A:30} {' '.join(f'{entry:3}' for entry in tables['parsing_table'][row])}")
@@ -0,0 +1,130 @@
+'''
+Intermediate Representation module of the Simple C Compiler
+
+Three address codes are Instruction tuples of an opcode and up to three
+(mode, value) operands, they are formatted to text only for output files
+'''
+
+from enum import IntEnum
+from collections import namedtuple
+
+
+class Opcode(IntEnum):
+    ASSIGN = 0
+    ADD = 1
+    SUB = 2
+    MULT = 3
+    EQ = 4
+    LT = 5
+    JP = 6
+    JPF = 7
+    PRINT = 8
+
+
+ASSIGN, ADD, SUB, MULT, EQ, LT, JP, JPF, PRINT = Opcode
+opcodes = tuple(opcode.name for opcode in Opcode)
+opcode_to_id = {opcode.name : opcode for opcode in Opcode}
+
+# operand addressing modes
+DIRECT    = 0 # 500   (value stored at address 500)
+IMMEDIATE = 1 # #500  (constant 500)
+INDIRECT  = 2 # @500  (value stored at address stored at address 500)
+
+mode_prefixes = ("", "#", "@")
+
+# memory cells hold signed 32-bit words, arithmetic wraps around like in the tester program
+WORD_BITS = 32
+
+
+def to_word(value):
+    ''' wraps int value around into a signed WORD_BITS bit word '''
+    return ((value + 2 ** (WORD_BITS - 1)) & (2 ** WORD_BITS - 1)) - 2 ** (WORD_BITS - 1)
+
+
+Instruction = namedtuple("Instruction", ["op", "a", "b", "c"])
+Instruction.__new__.__defaults__ = (None, None, None) # missing operands are None
+Operand = namedtuple("Operand", ["mode", "value"])
+
+
+class CodeAddress(int):
+    ''' value of an immediate operand that is the index of an instruction
+        (a return address), so that optimizations moving the instructions
+        can find and relocate it. Otherwise it behaves like a plain int '''
+    __slots__ = ()
+
+
+def direct(addr):
+    return Operand(DIRECT, addr)
+
+
+def immediate(value):
+    return Operand(IMMEDIATE, value)
+
+
+def indirect(addr):
+    return Operand(INDIRECT, addr)
+
+
+def code_address(pc):
+    return Operand(IMMEDIATE, CodeAddress(pc))
+
+
+def format_operand(operand):
+    if operand is None:
+        return ""
+    mode, value = operand
+    return f"{mode_prefixes[mode]}{value}"
+
+
+def format_instruction(instruction):
+    ''' formats instruction like "(ADD, 500, #-2000, 500)", unfilled
+        instructions (None) are formatted as "PLACEHOLDER" '''
+    if instruction is None:
+        return "PLACEHOLDER"
+    op, a, b, c = instruction
+    return f"({opcodes[op]}, {format_operand(a)}, {format_operand(b)}, {format_operand(c)})"
+
+
+def decode_operand(arg):
+    ''' decodes operand string like "#-2000" into (mode, value) pair '''
+    if arg[0] == "#":
+        return Operand(IMMEDIATE, int(arg[1:]))
+    if arg[0] == "@":
+        return Operand(INDIRECT, int(arg[1:]))
+    return Operand(DIRECT, int(arg))
+
+
+def decode(three_addr_code):
+    ''' decodes three address code string like "(ADD, 500, #-2000, 500)"
+        into an Instruction '''
+    fields = [f.strip() for f in three_addr_code.strip().strip("()").split(",")]
+    try:
+        opcode = opcode_to_id[fields[0].upper()]
+    except KeyError:
+        raise RuntimeError(f"Unknown three address code '{three_addr_code}'")
+    operands = [decode_operand(arg) for arg in fields[1:] if arg]
+    return Instruction(opcode, *operands[:3])
+
+
+def format_program(program):
+    ''' formats program into "lineno<TAB>(three address code)" lines '''
+    return "".join([f"{lineno}\t{format_instruction(instruction)}\n" for lineno, instruction in enumerate(program)])
+
+
+def load_program_file(program_file):
+    ''' reads "lineno<TAB>(three address code)" formatted program file into a
+        list of instructions indexed by line number, invalid instructions
+        and missing line numbers are None '''
+    lines = []
+    with open(program_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                lineno, three_addr_code = line.split("\t", 1)
+                lines.append((int(lineno), three_addr_code))
+    program = [None] * (max([lineno for lineno, _ in lines], default=-1) + 1)
+    for lineno, three_addr_code in lines:
+        try:
+            program[lineno] = decode(three_addr_code)
+        except (RuntimeError, ValueError):
+            pass # invalid instructions only fail if they are executed
+    return program
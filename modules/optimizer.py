@@ -0,0 +1,605 @@
+'''
+Optimizer module of the Simple C Compiler
+
+Optimization passes over the three address codes of a
+finished program block (see ir.py)
+'''
+
+from heapq import heappush, heappop
+
+from cfg import ControlFlowGraph, find_leaders
+from ir import Instruction, Operand, CodeAddress, direct, immediate, code_address, to_word, \
+               ASSIGN, ADD, SUB, MULT, EQ, LT, JP, JPF, PRINT, DIRECT, IMMEDIATE, INDIRECT
+
+
+# 0 = no optimizations, 1 = constant folding and propagation, 2 = 1 + peephole optimizations
+opt_levels = (0, 1, 2)
+
+# folded arithmetic wraps around like in the machine, see ir.to_word
+binary_ops = {
+    ADD  : lambda a, b: to_word(a + b),
+    SUB  : lambda a, b: to_word(a - b),
+    MULT : lambda a, b: to_word(a * b),
+    EQ   : lambda a, b: int(a == b),
+    LT   : lambda a, b: int(a < b)
+}
+
+
+def read_addrs(instruction):
+    ''' yields memory addresses read by instruction, the cells pointed to
+        by indirect operands are not included '''
+    op, a, b, c = instruction
+    dest = store_operand(instruction)
+    if op == ASSIGN:
+        sources = (a,)
+    elif op in binary_ops:
+        sources = (a, b)
+    elif op == JP:
+        sources = (a,) if a[0] == INDIRECT else ()
+    elif op == JPF:
+        sources = (a, b) if b[0] == INDIRECT else (a,)
+    else: # op == PRINT
+        sources = (a,)
+    for operand in sources:
+        if operand[0] != IMMEDIATE:
+            yield operand[1]
+    if dest is not None and dest[0] == INDIRECT:
+        yield dest[1] # pointer of the store
+
+
+def is_jump_target(instruction, i):
+    ''' True if operand i (1-3) of instruction is a direct jump target (an instruction index) '''
+    op = instruction[0]
+    return (op == JP and i == 1 or op == JPF and i == 2) and instruction[i][0] != INDIRECT
+
+
+def store_operand(instruction):
+    ''' returns the operand instruction stores into, or None '''
+    op = instruction[0]
+    if op == ASSIGN:
+        return instruction[2]
+    if op in binary_ops:
+        return instruction[3]
+    return None
+
+
+def compact(program, keep, labels=None):
+    ''' returns program without the instructions whose keep flag is False,
+        jump targets, return addresses and the values of labels (a dict of
+        instruction indices, updated in place) are relocated to the
+        following kept instruction '''
+    n = len(program)
+    new_index = []
+    count = 0
+    for pc in range(n):
+        new_index.append(count)
+        if keep[pc]:
+            count += 1
+    new_index.append(count)
+
+    def relocate(pc):
+        if pc > n:
+            return pc - n + count # jumps past the end halt the program
+        return new_index[pc] if pc >= 0 else pc
+
+    new_program = []
+    for pc, instruction in enumerate(program):
+        if not keep[pc]:
+            continue
+        if instruction is not None:
+            op, a, b, c = instruction
+            if op == JP and a[0] != INDIRECT:
+                instruction = Instruction(JP, direct(relocate(a[1])))
+            elif op == JPF and b[0] != INDIRECT:
+                instruction = Instruction(JPF, a, direct(relocate(b[1])))
+            elif isinstance(a[1], CodeAddress) or b is not None and isinstance(b[1], CodeAddress):
+                # return addresses are only ever sources
+                if isinstance(a[1], CodeAddress):
+                    a = code_address(relocate(a[1]))
+                if b is not None and isinstance(b[1], CodeAddress):
+                    b = code_address(relocate(b[1]))
+                instruction = Instruction(op, a, b, c)
+        new_program.append(instruction)
+    if labels:
+        for name, pc in labels.items():
+            labels[name] = relocate(pc)
+    return new_program
+
+
+def _fold_block(program, keep, start, end, temps):
+    ''' folds constants forward through one basic block, known maps memory
+        addresses to their constant values. Indirect operands with a known
+        pointer become direct, unless they point into the temporaries (which
+        only happens when the temporaries overflow into the runtime stack) '''
+    known = {}
+
+    def load(operand):
+        mode, value = operand
+        if mode == INDIRECT and value in known:
+            addr = known[value]
+            if addr in known:
+                return immediate(known[addr])
+            return direct(addr) if addr not in temps else operand
+        if mode == DIRECT and value in known:
+            return immediate(known[value])
+        return operand
+
+    def store(operand, value):
+        mode, addr = operand
+        if mode == INDIRECT:
+            if addr not in known:
+                known.clear() # an unknown pointer may point anywhere
+                return operand
+            addr = known[addr]
+            if addr not in temps:
+                operand = direct(addr)
+        if value is None:
+            known.pop(addr, None)
+        else:
+            known[addr] = value
+        return operand
+
+    for pc in range(start, end):
+        instruction = program[pc]
+        if instruction is None:
+            continue
+        op, a, b, c = instruction
+        if op == ASSIGN:
+            a = load(a)
+            b = store(b, a[1] if a[0] == IMMEDIATE else None)
+        elif op in binary_ops:
+            a, b = load(a), load(b)
+            if a[0] == IMMEDIATE and b[0] == IMMEDIATE:
+                value = binary_ops[op](a[1], b[1])
+                op, a, b, c = ASSIGN, immediate(value), store(c, value), None
+            else:
+                c = store(c, None)
+        elif op == JPF:
+            a = load(a)
+            if a[0] == IMMEDIATE:
+                if a[1]:
+                    keep[pc] = False # never jumps
+                    continue
+                op, a, b = JP, b, None
+        elif op == PRINT:
+            a = load(a)
+        program[pc] = Instruction(op, a, b, c)
+
+
+def fold_constants(program, temps, labels=None):
+    ''' constant folding and propagation: folds arithmetic on constants,
+        propagates constants assigned to memory within basic blocks, turns
+        JPF on a constant into JP (or removes it) and finally removes stores
+        into the temporaries (range temps) which are never read.
+
+        Temporaries are assumed to be accessed only directly, which holds
+        for the code generator, as pointers only address the runtime stack.
+        Returns the optimized program as a new list, labels are relocated
+        as in compact. '''
+    program = list(program)
+    n = len(program)
+    keep = [True] * n
+    leaders = find_leaders(program)
+    for start, end in zip(leaders, leaders[1:] + [n]):
+        _fold_block(program, keep, start, end, temps)
+
+    # dead temporary store elimination
+    reads = {}
+    writers = {}
+    for pc, instruction in enumerate(program):
+        if instruction is None or not keep[pc]:
+            continue
+        for addr in read_addrs(instruction):
+            reads[addr] = reads.get(addr, 0) + 1
+        dest = store_operand(instruction)
+        if dest is not None and dest[0] == DIRECT and dest[1] in temps:
+            writers.setdefault(dest[1], []).append(pc)
+    worklist = [temp for temp in writers if not reads.get(temp)]
+    while worklist:
+        temp = worklist.pop()
+        for pc in writers.pop(temp, ()):
+            keep[pc] = False
+            for addr in read_addrs(program[pc]):
+                reads[addr] -= 1
+                if not reads[addr] and addr in writers:
+                    worklist.append(addr)
+    return compact(program, keep, labels)
+
+
+class PeepholeOptimizer(object):
+    ''' Sliding window optimizer which applies patterns to every instruction
+        of the program until none of them matches anymore.
+
+        A pattern is a function pattern(optimizer, pc) which inspects the
+        instruction at pc and the following one, rewrites them with replace
+        and delete if they match and returns True in that case. Windows never
+        span a basic block boundary (see leader), and deleted instructions
+        are compacted away with their jump targets relocated after each pass. '''
+
+    def __init__(self, program, temps, patterns=None, labels=None):
+        self.program = list(program)
+        self.temps = temps
+        self.labels = labels
+        self.patterns = list(peephole_patterns.values()) if patterns is None else patterns
+
+
+    def run(self, max_passes=10):
+        ''' returns the optimized program '''
+        for _ in range(max_passes):
+            n = len(self.program)
+            self.keep = [True] * n
+            self.leaders = set(find_leaders(self.program))
+            self.reads = {}
+            for instruction in self.program:
+                if instruction is not None:
+                    for addr in read_addrs(instruction):
+                        self.reads[addr] = self.reads.get(addr, 0) + 1
+            changed = False
+            for pc in range(n):
+                if self.keep[pc] and self.program[pc] is not None:
+                    for pattern in self.patterns:
+                        if pattern(self, pc):
+                            changed = True
+                            if not self.keep[pc]:
+                                break
+            if not changed:
+                break
+            self.program = compact(self.program, self.keep, self.labels)
+        return self.program
+
+
+    def instruction(self, pc):
+        ''' returns the instruction at pc if it exists and was not deleted '''
+        if 0 <= pc < len(self.program) and self.keep[pc]:
+            return self.program[pc]
+        return None
+
+
+    def next_instruction(self, pc):
+        ''' returns the instruction following pc in the same basic block '''
+        if pc + 1 in self.leaders:
+            return None
+        return self.instruction(pc + 1)
+
+
+    def jump_target(self, pc):
+        ''' returns the final target of a direct jump to pc by following
+            the chain of unconditional direct jumps starting at it '''
+        seen = set()
+        instruction = self.instruction(pc)
+        while instruction is not None and instruction[0] == JP and instruction[1][0] != INDIRECT and pc not in seen:
+            seen.add(pc)
+            pc = instruction[1][1]
+            instruction = self.instruction(pc)
+        return pc
+
+
+    def is_dead_temp(self, addr, reads=1):
+        ''' True if addr is a temporary read only by the given number of reads '''
+        return addr in self.temps and self.reads.get(addr, 0) == reads
+
+
+    def replace(self, pc, instruction):
+        self.program[pc] = instruction
+
+
+    def delete(self, pc):
+        self.keep[pc] = False
+
+
+def _move_into_store(optimizer, pc):
+    ''' "(OP, a, b, t) (ASSIGN, t, y)" -> "(OP, a, b, y)" when t is dead after the move '''
+    instruction = optimizer.program[pc]
+    dest = store_operand(instruction)
+    move = optimizer.next_instruction(pc)
+    if dest is None or dest[0] != DIRECT or move is None or move[0] != ASSIGN or move[1] != dest \
+       or not optimizer.is_dead_temp(dest[1]):
+        return False
+    if instruction[0] == ASSIGN:
+        optimizer.replace(pc, Instruction(ASSIGN, instruction[1], move[2]))
+    else:
+        optimizer.replace(pc, Instruction(*instruction[:3], move[2]))
+    optimizer.delete(pc + 1)
+    optimizer.reads[dest[1]] = 0
+    return True
+
+
+def _move_into_load(optimizer, pc):
+    ''' "(ASSIGN, x, t) (OP, t, ...)" -> "(OP, x, ...)" when t is dead after OP '''
+    move = optimizer.program[pc]
+    if move[0] != ASSIGN or move[2][0] != DIRECT or not optimizer.is_dead_temp(move[2][1]):
+        return False
+    instruction = optimizer.next_instruction(pc)
+    if instruction is None:
+        return False
+    op, a, b, c = instruction
+    temp = move[2]
+    # only the sources of the instruction which are read as values
+    if op == ASSIGN or op == PRINT or op == JPF:
+        sources = (True, False, False)
+    elif op in binary_ops:
+        sources = (True, True, False)
+    else:
+        return False
+    operands = [move[1] if is_source and operand == temp else operand
+                for is_source, operand in zip(sources, (a, b, c))]
+    if operands == [a, b, c]:
+        return False
+    optimizer.replace(pc + 1, Instruction(op, *operands))
+    optimizer.delete(pc)
+    optimizer.reads[temp[1]] = 0
+    return True
+
+
+def _jump_chain(optimizer, pc):
+    ''' "(JP, L)" or "(JPF, c, L)" where L is "(JP, M)" -> jump directly to M '''
+    op, a, b, _ = optimizer.program[pc]
+    if op != JP and op != JPF:
+        return False
+    target = a if op == JP else b
+    if target[0] == INDIRECT:
+        return False
+    final_target = optimizer.jump_target(target[1])
+    if final_target == target[1]:
+        return False
+    if op == JP:
+        optimizer.replace(pc, Instruction(JP, direct(final_target)))
+    else:
+        optimizer.replace(pc, Instruction(JPF, a, direct(final_target)))
+    return True
+
+
+def _redundant_jump(optimizer, pc):
+    ''' removes "(JP, L)" to the next instruction and "(JPF, c, L)" which
+        continues at L either way, i.e. jumps to the next instruction or
+        over a "(JP, L)" '''
+    op, a, b, _ = optimizer.program[pc]
+    if op == JP and a[0] != INDIRECT:
+        redundant = optimizer.jump_target(a[1]) == optimizer.jump_target(pc + 1)
+    elif op == JPF and b[0] != INDIRECT:
+        redundant = optimizer.jump_target(b[1]) == optimizer.jump_target(pc + 1)
+    else:
+        return False
+    if redundant:
+        optimizer.delete(pc)
+    return redundant
+
+
+def _algebraic_identity(optimizer, pc):
+    ''' "(ADD, x, #0, y)", "(SUB, x, #0, y)" and "(MULT, x, #1, y)" -> "(ASSIGN, x, y)",
+        self assignments "(ASSIGN, x, x)" are removed '''
+    op, a, b, c = optimizer.program[pc]
+    if op == ASSIGN:
+        if a == b and a[0] != IMMEDIATE:
+            optimizer.delete(pc)
+            return True
+        return False
+    identity = {ADD : 0, SUB : 0, MULT : 1}.get(op)
+    if identity is None:
+        return False
+    if b == (IMMEDIATE, identity):
+        x = a
+    elif a == (IMMEDIATE, identity) and op != SUB:
+        x = b
+    else:
+        return False
+    if x == c and x[0] != IMMEDIATE:
+        optimizer.delete(pc)
+    else:
+        optimizer.replace(pc, Instruction(ASSIGN, x, c))
+    return True
+
+
+# patterns of the peephole optimizer by name, new patterns can be added here
+peephole_patterns = {
+    "move_into_store" : _move_into_store,
+    "move_into_load" : _move_into_load,
+    "jump_chain" : _jump_chain,
+    "redundant_jump" : _redundant_jump,
+    "algebraic_identity" : _algebraic_identity
+}
+
+
+def peephole(program, temps, patterns=None, labels=None):
+    ''' runs the peephole optimizer with the given patterns (default: all
+        of peephole_patterns) over program, returns the optimized program '''
+    return PeepholeOptimizer(program, temps, patterns, labels).run()
+
+
+def _bits(bits):
+    ''' yields the indices of the set bits of int bits '''
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def allocate_temps(program, temps, temp_base, entries=None):
+    ''' packs the temporaries (range temps) of program into as few slots
+        starting at temp_base as possible: computes the live range of each
+        temporary by liveness analysis over the control flow graph (see cfg.py,
+        entries maps function names to entry instructions) and assigns the
+        slots by linear scan allocation.
+
+        Functions are allocated callees first, so that temporaries live
+        across a call get slots above the ones used by the called functions.
+        Without entries the liveness analysis follows calls and returns.
+
+        Returns the rewritten program, the number of slots and the peak number
+        of simultaneously live temporaries of each function in entries. '''
+    graph = ControlFlowGraph(program, entries, interprocedural=not entries)
+    n_blocks = len(graph)
+    index = {} # temporary address -> bit index
+    uses, defs = [], []
+    for start, end in zip(graph.starts, graph.ends):
+        use = defined = 0
+        for pc in range(start, end):
+            instruction = program[pc]
+            if instruction is None:
+                continue
+            for addr in read_addrs(instruction):
+                if addr in temps:
+                    bit = 1 << index.setdefault(addr, len(index))
+                    if not defined & bit:
+                        use |= bit
+            dest = store_operand(instruction)
+            if dest is not None and dest[0] == DIRECT and dest[1] in temps:
+                defined |= 1 << index.setdefault(dest[1], len(index))
+        uses.append(use)
+        defs.append(defined)
+
+    # backward liveness of the temporaries by blocks
+    live_in = [0] * n_blocks
+    live_out = [0] * n_blocks
+    worklist = list(range(n_blocks))
+    in_worklist = [True] * n_blocks
+    while worklist:
+        b = worklist.pop()
+        in_worklist[b] = False
+        out = 0
+        for s in graph.successors[b]:
+            out |= live_in[s]
+        live_out[b] = out
+        live = uses[b] | (out & ~defs[b])
+        if live != live_in[b]:
+            live_in[b] = live
+            for p in graph.predecessors[b]:
+                if not in_worklist[p]:
+                    in_worklist[p] = True
+                    worklist.append(p)
+
+    # live ranges are the hulls of the instructions where the temporaries are live
+    n = len(program)
+    range_start = [n] * len(index)
+    range_end = [-1] * len(index)
+
+    def extend(temp, pc):
+        if pc < range_start[temp]:
+            range_start[temp] = pc
+        if pc > range_end[temp]:
+            range_end[temp] = pc
+
+    for b, (start, end) in enumerate(zip(graph.starts, graph.ends)):
+        for temp in _bits(live_in[b]):
+            extend(temp, start)
+        for temp in _bits(live_out[b]):
+            extend(temp, end - 1)
+    def temp_operands(instruction):
+        ''' indices of the operands of instruction accessing a temporary '''
+        return [i for i in (1, 2, 3) if instruction[i] is not None and instruction[i][0] != IMMEDIATE
+                and instruction[i][1] in index and not is_jump_target(instruction, i)]
+
+    for pc, instruction in enumerate(program):
+        if instruction is not None:
+            for i in temp_operands(instruction):
+                extend(index[instruction[i][1]], pc)
+
+    # temporaries live across calls, by the functions called
+    function_of = [graph.function_of(range_start[temp]) for temp in range(len(index))]
+    crossing = {}
+    callees = {}
+    if entries:
+        for block, callee, _ in graph.calls:
+            callee = graph.function_of(callee)
+            callees.setdefault(graph.function_of(graph.starts[block]), set()).add(callee)
+            for temp in _bits(live_out[block]):
+                crossing.setdefault(temp, set()).add(callee)
+
+    # callees before callers, the functions of a recursive cycle in any order
+    order = []
+    visited = set()
+    for root in sorted(set(function_of), key=lambda f: -1 if f is None else f):
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(sorted(callees.get(root, ()))))]
+        while stack:
+            function, successors = stack[-1]
+            for callee in successors:
+                if callee not in visited:
+                    visited.add(callee)
+                    stack.append((callee, iter(sorted(callees.get(callee, ())))))
+                    break
+            else:
+                order.append(function)
+                stack.pop()
+
+    def reachable(function):
+        ''' function and the functions it calls directly or indirectly '''
+        functions = {function}
+        stack = [function]
+        while stack:
+            for callee in callees.get(stack.pop(), ()):
+                if callee not in functions:
+                    functions.add(callee)
+                    stack.append(callee)
+        return functions
+
+    reachable_of = {}
+    for function in set(function_of) | {callee for called in crossing.values() for callee in called}:
+        reachable_of[function] = reachable(function)
+
+    # linear scan in each function, a slot is free after the live range of its
+    # temporary has ended. A temporary live across a call gets a slot above the
+    # ones used by the functions the call reaches, unless the call may recurse
+    # into the function itself: then it gets a slot of its own after all others
+    temps_of = {}
+    for temp in sorted(range(len(index)), key=lambda temp: (range_start[temp], range_end[temp])):
+        temps_of.setdefault(function_of[temp], []).append(temp)
+    slot_of = [0] * len(index)
+    used_slots = {} # number of slots used by the temporaries of each function
+    recursive = [] # temporaries live across recursive calls
+    for function in order:
+        active = [] # heap of (range end, slot)
+        free_slots = []
+        n_slots = 0
+        for temp in temps_of.get(function, ()):
+            while active and active[0][0] < range_start[temp]:
+                heappush(free_slots, heappop(active)[1])
+            called = crossing.get(temp, ())
+            if any(function in reachable_of[callee] for callee in called):
+                recursive.append(temp)
+                continue
+            floor = max([used_slots.get(f, 0) for callee in called for f in reachable_of[callee]], default=0)
+            skipped = []
+            while free_slots and free_slots[0] < floor:
+                skipped.append(heappop(free_slots))
+            if free_slots:
+                slot = heappop(free_slots)
+            else:
+                skipped.extend(range(n_slots, floor))
+                slot = max(n_slots, floor)
+                n_slots = slot + 1
+            for free_slot in skipped:
+                heappush(free_slots, free_slot)
+            slot_of[temp] = slot
+            heappush(active, (range_end[temp], slot))
+        used_slots[function] = n_slots
+    n_slots = max(used_slots.values(), default=0)
+    for temp in recursive:
+        slot_of[temp] = n_slots
+        n_slots += 1
+
+    new_addr = {addr : temp_base + 4 * slot_of[temp] for addr, temp in index.items()}
+    new_program = []
+    for instruction in program:
+        if instruction is not None:
+            operands = list(instruction)
+            for i in temp_operands(instruction):
+                operands[i] = Operand(instruction[i][0], new_addr[instruction[i][1]])
+            instruction = Instruction(*operands)
+        new_program.append(instruction)
+
+    # peak number of live temporaries in each function
+    live_count = [0] * (n + 1)
+    for temp in range(len(index)):
+        live_count[range_start[temp]] += 1
+        live_count[range_end[temp] + 1] -= 1
+    for pc in range(n):
+        live_count[pc + 1] += live_count[pc]
+    functions = sorted((entries or {}).items(), key=lambda item: item[1])
+    peaks = {}
+    for i, (name, entry) in enumerate(functions):
+        end = functions[i + 1][1] if i + 1 < len(functions) else n
+        peaks[name] = max(live_count[entry:end], default=0)
+    return new_program, n_slots, peaks
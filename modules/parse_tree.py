@@ -0,0 +1,124 @@
+'''
+Parse Tree module of the Simple C Compiler
+
+Array backed parse tree where nodes are indices into
+parallel columns instead of individual objects
+'''
+
+from array import array
+
+
+class ParseTree(object):
+    ''' Parse tree stored in parallel array('i') columns, node 0 is the root.
+        Children of a node are a doubly linked list of siblings, so that any
+        node can be removed in constant time. -1 marks a missing node or token '''
+
+    def __init__(self, root_symbol="Program"):
+        self.symbols = []     # grammar symbols by symbol id
+        self.symbol_ids = {}
+        self.tokens = []      # token strings by token index
+        self.symbol = array('i')
+        self.parent = array('i')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.prev_sibling = array('i')
+        self.token = array('i')
+        self._add_node(root_symbol, -1)
+
+
+    def __len__(self):
+        return len(self.symbol)
+
+
+    def _symbol_id(self, symbol):
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return symbol_id
+
+
+    def _add_node(self, symbol, parent):
+        node = len(self.symbol)
+        self.symbol.append(self._symbol_id(symbol))
+        self.parent.append(parent)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        self.prev_sibling.append(-1)
+        self.token.append(-1)
+        return node
+
+
+    def add_children(self, parent, rhs):
+        ''' adds the symbols of a production as the children of parent (which
+            must not have children yet), returns the node of each symbol or -1
+            for action symbols which are not part of the tree '''
+        nodes = []
+        prev = -1
+        for symbol in rhs:
+            if symbol.startswith("#"):
+                nodes.append(-1)
+                continue
+            node = self._add_node(symbol, parent)
+            if prev == -1:
+                self.first_child[parent] = node
+            else:
+                self.next_sibling[prev] = node
+                self.prev_sibling[node] = prev
+            prev = node
+            nodes.append(node)
+        return nodes
+
+
+    def set_token(self, node, token):
+        self.token[node] = len(self.tokens)
+        self.tokens.append(token)
+
+
+    def remove(self, node):
+        ''' unlinks the subtree of node from the tree '''
+        parent = self.parent[node]
+        if parent == -1:
+            return
+        prev, next = self.prev_sibling[node], self.next_sibling[node]
+        if prev == -1:
+            self.first_child[parent] = next
+        else:
+            self.next_sibling[prev] = next
+        if next != -1:
+            self.prev_sibling[next] = prev
+        self.parent[node] = self.prev_sibling[node] = self.next_sibling[node] = -1
+
+
+    def clean_up(self):
+        ''' removes non terminals and unmet terminals from leaf nodes '''
+        epsilon = self.symbol_ids.get("EPSILON", -1)
+        symbol, first_child, token = self.symbol, self.first_child, self.token
+        remove_nodes = [node for node in range(len(symbol)) if first_child[node] == -1
+                        and token[node] == -1 and symbol[node] != epsilon]
+        for node in remove_nodes:
+            self.remove(node)
+
+
+    def label(self, node):
+        token = self.token[node]
+        return self.tokens[token] if token != -1 else self.symbols[self.symbol[node]]
+
+
+    def render(self):
+        ''' yields the lines of the tree in pre-order, drawn like anytree.RenderTree '''
+        yield f"{self.label(0)}\n"
+        stack = [(self.first_child[0], "")] if self.first_child[0] != -1 else []
+        while stack:
+            node, indent = stack.pop()
+            next = self.next_sibling[node]
+            if next != -1:
+                stack.append((next, indent))
+                yield f"{indent}├── {self.label(node)}\n"
+                child_indent = indent + "│   "
+            else:
+                yield f"{indent}└── {self.label(node)}\n"
+                child_indent = indent + "    "
+            child = self.first_child[node]
+            if child != -1:
+                stack.append((child, child_indent))
@@ -5,77 +5,58 @@ Author:             Pasi Pyrrö
 Date:               20 March 2020
 '''
 
+import io
 import os
+import re
+import sys
+import mmap
+import codecs
+from array import array
+from collections import deque
+from context import CompilationContext
 
 script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-class SymbolTableManager(object):
-    ''' Manages the symbol table of the compiler 
-    which is used across modules '''
-    _global_funcs = [{
-        "lexim": "output",
-        "scope": 0,
-        "type": "void",
-        "role": "function",
-        "arity": 1,
-        "params": ["int"]
-    }]
-
-    @classmethod
-    def init(cls):
-        cls.scope_stack = [0]
-        cls.temp_stack = [0]
-        cls.arg_list_stack = []
-        cls.symbol_table = cls._global_funcs.copy()
-        cls.declaration_flag = False
-        cls.error_flag = False
-
-    @classmethod
-    def scope(cls):
-        return len(cls.scope_stack) - 1
-
-    @classmethod
-    def insert(cls, lexim):
-        cls.symbol_table.append({"lexim" : lexim, "scope" : cls.scope()})
-
-    @classmethod
-    def _exists(cls, lexim, scope):
-        for row in cls.symbol_table:
-            if row["lexim"] == lexim and row["scope"] == scope:
-                return True
-        return False
-
-    @classmethod
-    def findrow(cls, value, attr="lexim"):
-        for i in range(len(cls.symbol_table) - 1, -1, -1): 
-            row = cls.symbol_table[i]
-            if row[attr] == value:
-                return row
-        return None
-
-    @classmethod
-    def findrow_idx(cls, value, attr="lexim"):
-        for i in range(len(cls.symbol_table) - 1, -1, -1): 
-            row = cls.symbol_table[i]
-            if row[attr] == value:
-                return i
-        return None
-    
-    @classmethod
-    def install_id(cls, lexim):
-        if not cls.declaration_flag:
-            i = cls.findrow_idx(lexim)
-            if i is not None:
-                return i
-        return len(cls.symbol_table)
-
-    @classmethod
-    def get_enclosing_fun(cls, level=1):
-        try:
-            return cls.symbol_table[cls.scope_stack[-level] - 1]
-        except IndexError:
-            return None
+terminal_to_col = {
+    "ID"        : 0,
+    ";"         : 1,
+    "["         : 2,
+    "NUM"       : 3,
+    "]"         : 4,
+    "("         : 5,
+    ")"         : 6,
+    "int"       : 7,
+    "void"      : 8,
+    ","         : 9,
+    "{"         : 10,
+    "}"         : 11,
+    "continue"  : 12,
+    "break"     : 13,
+    "if"        : 14,
+    "else"      : 15,
+    "while"     : 16,
+    "return"    : 17,
+    "switch"    : 18,
+    "case"      : 19,
+    ":"         : 20,
+    "default"   : 21,
+    "="         : 22,
+    "<"         : 23,
+    "=="        : 24,
+    "+"         : 25,
+    "-"         : 26,
+    "*"         : 27,
+    "$"         : 28
+}
 
+# token type of each token kind id in the batch tokenization api
+kind_to_token_type = tuple(
+    "ID" if terminal == "ID" else
+    "NUM" if terminal == "NUM" else
+    "EOF" if terminal == "$" else
+    "KEYWORD" if terminal.isalpha() else
+    "SYMBOL" for terminal in terminal_to_col
+)
 
 char_to_col = {        # abbreviations in DFA
     "WHITESPACE" : 0,  # w
@@ -144,33 +125,85 @@ unclosed_comment_states = {14, 15, 17}
 
 whitespaces = {' ', '\r', '\t', '\v', '\f'} # \n excluded as it has special meaning in one line comments
 
+# Master pattern of the regex scanning engine. A token is only accepted if its end
+# is decided by the next character, which must not start a lexical error (like the
+# letter in "12a"), hence the lookaheads. Everything the pattern does not match,
+# i.e. lexical errors and tokens at the end of the input buffer, is left to the dfa.
+_delimiter = r"[ \t\r\v\f\n*=,;:\[\](){}+\-</]" # w * = s / \n
+token_patterns = (
+    ("WHITESPACE",    r"[ \t\r\v\f\n]+"),
+    ("COMMENT",       r"/\*.*?\*/|//[^\n]*\n"),
+    ("NUM",           rf"[0-9]+(?={_delimiter})"),
+    ("ID_OR_KEYWORD", rf"[A-Za-z][A-Za-z0-9]*(?={_delimiter})"),
+    ("SYMBOL",        r"==|=(?=[ \t\r\v\f\n0-9A-Za-z*,;:\[\](){}+\-</])"
+                      r"|\*(?=[ \t\r\v\f\n0-9A-Za-z*=,;:\[\](){}+\-<])|[,;:\[\](){}+\-<]"),
+)
+master_pattern = "|".join(f"(?P<{token}>{pattern})" for token, pattern in token_patterns)
+master_regex = re.compile(master_pattern, re.DOTALL)                         # for decoded input
+master_regex_bytes = re.compile(master_pattern.encode("ascii"), re.DOTALL)  # for mapped input
+
+
+class TokenStream(object):
+    ''' Compact token stream produced by the batch tokenization api as parallel
+        columns: token kind id (terminal_to_col), interned lexeme id (index to
+        lexemes, which is shared between the batches of a file) and line number.
+        Identifiers are not installed into the symbol table yet, as that depends
+        on the state of semantic analysis when the token is consumed. '''
+
+    def __init__(self, lexemes):
+        self.kinds = array("i")
+        self.values = array("i")
+        self.lines = array("i")
+        self.lexemes = lexemes
+        self.first_error = None # index of the first token scanned after a lexical error
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def token(self, i):
+        ''' returns i:th token in the (token type, lexim) format of Scanner.get_next_token '''
+        return (kind_to_token_type[self.kinds[i]], self.lexemes[self.values[i]])
+
 
 class Scanner(object):
     ''' Lexical analyzer object which tokenizes input source file 
         according to C minus lexical specification '''
 
-    def __init__(self, input_file, chunk_size=8192, max_state_size=float("inf")):
+    def __init__(self, input_file, chunk_size=8192, max_state_size=float("inf"), use_mmap=True, use_regex=True,
+                 keep_tokens=True, context=None, source=None):
         assert chunk_size >= 16, "Minimum supported chunk size is 16!"
-        if not os.path.isabs(input_file):
+        if source is not None: # source text is scanned instead of input_file
+            input_file = None
+        elif input_file != "-" and not os.path.isabs(input_file): # "-" reads stdin
             input_file = os.path.join(script_dir, input_file)
         self.input_file = input_file
+        self.context = context or CompilationContext()
+        self.symbol_table_manager = self.context.symbol_table_manager
         self.line_number = 1
         self.first_line = 1
-        self._lexical_errors = []
+        # how many lines of tokens and lexical errors we want to keep in memory (default: unlimited)
+        self.max_state_size = max_state_size
+        self.keep_tokens = keep_tokens and max_state_size > 0 # keep token history for printing
+        # ring buffer of the latest lexical errors, lexical_error_count has the total number of errors
+        self._lexical_errors = deque(maxlen=None if max_state_size == float("inf") else int(max_state_size))
         self.tokens = {} # access tokens by line number
-        self.tokens[self.line_number] = []
-        self.max_state_size = max_state_size # how many lines of tokens we want to keep in memory (default: unlimited)
+        if self.keep_tokens:
+            self.tokens[self.line_number] = []
 
-        self.tokens_file = os.path.join(script_dir, "output", "tokens.txt")
-        self.symbol_file = os.path.join(script_dir, "output", "symbol_table.txt")
+        self.tokens_file = self.context.output_path("tokens.txt")
+        self.symbol_file = self.context.output_path("symbol_table.txt")
 
-        self.errors_file = os.path.join(script_dir, "errors", "lexical_errors.txt")
+        self.errors_file = self.context.errors_path("lexical_errors.txt")
 
         self.chunk_size = chunk_size
         self.file_pointer = 0
         self.max_unclosed_comment_size = 15
-        self.input = ""
-        self.read_input()
+        self.lexical_error_count = 0
+        self.lexemes = [] # interned lexemes of the batch tokenization api
+        self._lexeme_ids = {}
+        self.use_regex = use_regex # match tokens with master regex, dfa is used as a fallback
+        self.input = ""  # input buffer which is only replaced when new input is read
+        self.pos = 0     # position of the next unread character in the input buffer
 
         # lexical specification
         self._symbols = {',', ';', ':', '[', ']', '(', ')', '{', '}', '+', '-', '<'} # = and * excluded
@@ -190,14 +223,20 @@ class Scanner(object):
             "case",         # 9
             "return"        # 10
         ]
-        self.identifiers = keywords
+        self.identifiers = keywords # interned identifiers in the order of appearance
+        self.identifier_ids = {lexim : i for i, lexim in enumerate(keywords)}
         self.keywords = set(keywords)
 
+        self._open_input(use_mmap, source)
+
 
     @property
     def lexical_errors(self):
         lexical_errors = []
-        if self._lexical_errors:
+        if self.lexical_error_count:
+            omitted = self.lexical_error_count - len(self._lexical_errors)
+            if omitted:
+                lexical_errors.append(f"{omitted} earlier lexical errors omitted.\n")
             for lineno, lexim, error in self._lexical_errors:
                 lexical_errors.append(f"#{lineno} : Lexical Error! '{lexim}' rejected, reason: {error}.\n")
         else:
@@ -206,13 +245,11 @@ class Scanner(object):
 
     
     def save_lexical_errors(self):
-        if self.max_state_size > 0:
-            with open(self.errors_file, "w") as f:
-                f.write(self.lexical_errors)
+        self.context.write(self.errors_file, self.lexical_errors)
 
 
     def id_to_lexim(self, token_id):
-        return SymbolTableManager.symbol_table[token_id]['lexim']
+        return self.symbol_table_manager.symbol_table[token_id]['lexim']
 
     
     def token_to_str(self, token):
@@ -222,14 +259,92 @@ class Scanner(object):
             return "({}, {})".format(*token)
 
 
+    def _open_input(self, use_mmap, source=None):
+        ''' maps the whole input file into memory if possible, otherwise
+            (pipes, stdin, empty files, source text) the input is read in chunks '''
+        if source is not None:
+            self._file = io.BytesIO(source.encode("utf-8"))
+        elif self.input_file == "-":
+            self._file = sys.stdin.buffer
+        else:
+            self._file = open(self.input_file, "rb")
+        self.mapped = False
+        if use_mmap:
+            try:
+                self.input = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.mapped = True
+            except (ValueError, OSError):
+                pass
+        # input characters are classified into dfa table columns in bulk, one chunk
+        # at a time, with a translation table from ascii code to column index.
+        # Non-ascii characters can only appear in comments or lexical errors, hence
+        # they are all of type OTHER (encoded as "?" in text and as bytes >= 128 in
+        # the mapped input, where multibyte characters are handled explicitly)
+        self._column_table = bytes([self._resolve_dfa_table_column(chr(b)) if b < 128
+                                    else char_to_col["OTHER"] for b in range(256)])
+        self._columns = b""   # dfa table columns of the input characters
+        self._columns_base = 0 # input buffer position of the first column
+        if not self.mapped:
+            self._decoder = codecs.getincrementaldecoder("utf-8")()
+        try:
+            self.read_input()
+        except EOFError:
+            pass # empty input, get_next_token returns EOF
+
+
+    def _close_input(self):
+        if self.mapped:
+            self.input.close()
+            self.mapped = False
+        if self._file is not None and self._file is not sys.stdin.buffer:
+            self._file.close()
+        self._file = None
+
+
     def read_input(self):
-        with open(self.input_file, "rb") as f:
-            f.seek(self.file_pointer)
-            chunk = f.read(self.chunk_size)
-        if not chunk:
+        if self._file is None:
             raise EOFError
-        self.input += chunk.decode()
-        self.file_pointer += self.chunk_size
+        if self.mapped:
+            # classify the next chunk of the mapped input, the input itself is not copied
+            columns_end = max(self._columns_base + len(self._columns), self.pos)
+            if columns_end >= len(self.input):
+                raise EOFError
+            columns_end = min(columns_end + self.chunk_size, len(self.input))
+            self._columns = self.input[self.pos:columns_end].translate(self._column_table)
+            self._columns_base = self.pos
+            return
+        text = ""
+        while not text: # a chunk may end in the middle of a multibyte character
+            chunk = self._file.read(self.chunk_size)
+            if not chunk:
+                self._decoder.decode(b"", final=True)
+                raise EOFError
+            self.file_pointer += len(chunk)
+            text = self._decoder.decode(chunk)
+        # drop the consumed part of the buffer once per chunk instead of once per token
+        self._columns = self._columns[self.pos - self._columns_base:] \
+                      + text.encode("ascii", "replace").translate(self._column_table)
+        self.input = self.input[self.pos:] + text
+        self.pos = 0
+
+
+    def _lexim(self, start, end):
+        if self.mapped:
+            return self.input[start:end].decode("utf-8", "replace")
+        return self.input[start:end]
+
+
+    def _count_newlines(self, start, end=None):
+        if not self.mapped:
+            return self.input.count("\n", start, end)
+        buf = self.input
+        end = len(buf) if end is None else end
+        count = 0
+        i = buf.find(b"\n", start, end)
+        while i != -1:
+            count += 1
+            i = buf.find(b"\n", i + 1, end)
+        return count
 
 
     def _resolve_dfa_table_column(self, input_char):
@@ -248,106 +363,206 @@ class Scanner(object):
 
 
     def save_symbol_table(self):
-        with open(self.symbol_file, "w") as f:
-            for i, symbol in enumerate(self.identifiers):
-                f.write(f"{i+1}.\t{symbol}\n")
+        self.context.write(self.symbol_file, "".join([f"{i+1}.\t{symbol}\n" for i, symbol in enumerate(self.identifiers)]))
 
 
     def save_tokens(self):
-        if self.max_state_size > 0:
-            with open(self.tokens_file, "w") as f:
-                for lineno, tokens in self.tokens.items():
-                    if tokens:
-                        f.write(f"{lineno}.\t{' '.join([f'({t}, {l})' for t, l in tokens])}\n")
+        if self.keep_tokens:
+            self.context.write(self.tokens_file, "".join([f"{lineno}.\t{' '.join([f'({t}, {l})' for t, l in tokens])}\n"
+                                                          for lineno, tokens in self.tokens.items() if tokens]))
 
 
     def _switch_line(self, num_lines):
         if num_lines > 0:
-            for i in range(num_lines):
-                self.tokens[self.line_number + i + 1] = []
+            if self.keep_tokens:
+                for i in range(num_lines):
+                    self.tokens[self.line_number + i + 1] = []
+                while len(self.tokens) > self.max_state_size:
+                    self.tokens.pop(self.first_line, None)
+                    self.first_line += 1
             self.line_number += num_lines
-            # remove leading whitespace from next line
-            # (expect newlines as we need them for line number calculations)
-            self.input = self.input.lstrip(" ").lstrip("\t")
 
 
     def update_symbol_table(self, lexim):
-        symbol_id = SymbolTableManager.install_id(lexim)
-        if symbol_id == len(SymbolTableManager.symbol_table):
-            SymbolTableManager.insert(lexim)
+        symbol_id = self.symbol_table_manager.install_id(lexim)
+        if symbol_id == len(self.symbol_table_manager.symbol_table):
+            self.symbol_table_manager.insert(lexim)
         return symbol_id
 
 
     def get_next_token(self):
-        save_state = None
+        token, lexim = self._scan()
+        if token == "ID":
+            lexim = self.update_symbol_table(lexim)
+        return (token, lexim)
+
+
+    def __iter__(self):
+        ''' streams tokens of the rest of the input, the last one is the EOF token '''
+        token = None
+        while token != ("EOF", "$"):
+            token = self.get_next_token()
+            yield token
+
+
+    def tokenize_batches(self, batch_size=4096):
+        ''' yields the rest of the input as TokenStream batches of at most batch_size
+            tokens, the last batch ends with the EOF token '''
+        lexemes = self.lexemes
+        lexeme_ids = self._lexeme_ids
+        kind_ids = dict(terminal_to_col)
+        scan = self._scan
+        eof = False
+        while not eof:
+            # error flag is raised when the parser reaches the erroneous part of the input
+            error_flag = self.symbol_table_manager.error_flag
+            error_count = self.lexical_error_count
+            batch = TokenStream(lexemes)
+            kinds, values, lines = batch.kinds, batch.values, batch.lines
+            for i in range(batch_size):
+                token, lexim = scan()
+                if token == "ID" or token == "NUM":
+                    kind = kind_ids[token]
+                elif token == "EOF":
+                    kind = kind_ids["$"]
+                    eof = True
+                else:
+                    kind = kind_ids[lexim]
+                lexeme_id = lexeme_ids.get(lexim)
+                if lexeme_id is None:
+                    lexeme_id = lexeme_ids[lexim] = len(lexemes)
+                    lexemes.append(lexim)
+                kinds.append(kind)
+                values.append(lexeme_id)
+                lines.append(self.line_number)
+                if batch.first_error is None and self.lexical_error_count > error_count:
+                    batch.first_error = i
+                if eof:
+                    break
+            self.symbol_table_manager.error_flag = error_flag
+            yield batch
+
+
+    def tokenize_all(self):
+        ''' tokenizes the rest of the input into a single TokenStream '''
+        return next(self.tokenize_batches(sys.maxsize))
+
+
+    def _scan(self):
+        ''' returns next (token type, lexim) pair, identifiers are not installed
+            into the symbol table '''
+        if not self.use_regex:
+            return self._next_token_dfa()
+
+        regex = master_regex_bytes if self.mapped else master_regex
+        while True:
+            buf = self.input
+            pos = self.pos
+            m = regex.match(buf, pos)
+            end = m.end() if m is not None else len(buf)
+            if end >= len(buf): # let the dfa deal with errors and the end of the buffer
+                return self._next_token_dfa()
+            self.pos = end
+            token = m.lastgroup
+            if token == "WHITESPACE" or token == "COMMENT": # these will not be returned
+                self._switch_line(self._count_newlines(pos, end)) # update line number etc
+                continue # proceed to next token
+            return self._token(token, self._lexim(pos, end))
+
+
+    def _token(self, token, lexim):
+        if token == "ID_OR_KEYWORD": # distinguish between ids and keywords
+            token = "KEYWORD" if lexim in self.keywords else "ID"
+
+        if self.keep_tokens:
+            self.tokens[self.line_number].append((token, lexim)) # save tokens later for printing
+        
+        if token == "ID" and lexim not in self.identifier_ids:
+            self.identifier_ids[lexim] = len(self.identifiers)
+            self.identifiers.append(lexim)
+
+        return (token, lexim)
+
+
+    def _next_token_dfa(self):
+        resume = None # dfa traversal state of a token which continues in the next chunk
         error_occurred = False
         input_ended = False
         s = 0 # initial state
 
-        if len(self.tokens.keys()) > self.max_state_size:
-            self.tokens.pop(self.first_line, None)
-            self.first_line += 1
-        
-        if len(self._lexical_errors) > self.max_state_size:
-            self._lexical_errors.pop(0)
-
         while True: # Loop until we find valid token
-            if not self.input or input_ended:
+            if self.pos >= self._columns_base + len(self._columns) or input_ended:
                 try:
                     self.read_input()
                 except EOFError:
                     if s in unclosed_comment_states:
                         mucs = self.max_unclosed_comment_size
-                        err_token = self.input[:mucs]
-                        if len(self.input) > len(err_token):
-                            err_token = err_token + " ..."
-                        SymbolTableManager.error_flag = True
+                        # a character is at most 4 bytes long in utf-8
+                        err_token = self._lexim(self.pos, self.pos + 4 * (mucs + 1))
+                        if len(err_token) > mucs:
+                            err_token = err_token[:mucs] + " ..."
+                        self.symbol_table_manager.error_flag = True
+                        self.lexical_error_count += 1
                         self._lexical_errors.append((self.line_number, err_token, "unclosed comment"))
-                    self.line_number += self.input.count("\n")
+                    self.line_number += self._count_newlines(self.pos)
+                    self._close_input()
                     self.input = ""
+                    self.pos = 0
+                    self._columns = b""
+                    self._columns_base = 0
                     return ("EOF", "$")
 
-            token_candidates = []
+            if resume is None:
+                s, start, token_candidates = 0, 0, []
+            else:
+                # the token start is kept in the buffer when new input is read,
+                # hence we can continue the traversal where the previous chunk ended
+                s, start, token_candidates = resume
+            resume = None
             error_occurred = False
             input_ended = False
 
-            s = 0 if save_state is None else save_state 
-            save_state = None
+            buf = self.input
+            pos = self.pos
+            columns = self._columns
+            offset = pos - self._columns_base
+            remaining = len(columns) - offset
+            dfa, error_states, accepting, accepting_star = token_dfa, state_to_error_message, F, Fstar
 
             # traverse the dfa as long as we can with the remaining input
-            for i in range(len(self.input) + 1):
-                try:
-                    a = self.input[i]
-                except IndexError:
-                    a = self.input[-1]
-                col = self._resolve_dfa_table_column(a)
-                next_s = token_dfa[s][col]
-
-                if s in state_to_error_message: # are we in an error state?
+            for i in range(start, remaining + 1):
+                if i < remaining:
+                    col = columns[offset + i]
+                else:
+                    col = columns[-1]
+                next_s = dfa[s][col]
+
+                if s in error_states: # are we in an error state?
                     if s == 22:
                         i -= 1 # this is a lookahead error state (invalid comment)
-                    lexim, error = self.input[:i], state_to_error_message[s]
-                    if self.max_state_size > 0:
-                        SymbolTableManager.error_flag = True
-                        self._lexical_errors.append((self.line_number, lexim, error))
-                    else:
-                        print(f"Lexical Error in line {self.line_number}: {error} '{lexim}'")
-                    self.input = self.input[i:] # skip invalid token (panic mode)
+                    elif self.mapped and buf[pos + i - 1] >= 0xC0:
+                        # reject the whole multibyte character instead of its first byte
+                        while pos + i < len(buf) and 0x80 <= buf[pos + i] < 0xC0:
+                            i += 1
+                    lexim, error = self._lexim(pos, pos + i), state_to_error_message[s]
+                    self.symbol_table_manager.error_flag = True
+                    self.lexical_error_count += 1
+                    self._lexical_errors.append((self.line_number, lexim, error))
+                    self.pos = pos + i # skip invalid token (panic mode)
                     error_occurred = True
                     break
                 
-                if s in F: # are we in an accepting state?
-                    if s in Fstar:
-                        token_candidates.append((s, self.input[:i-1]))
+                if s in accepting: # are we in an accepting state?
+                    if s in accepting_star:
+                        token_candidates.append((s, i - 1))
                     else:
-                        token_candidates.append((s, self.input[:i]))
+                        token_candidates.append((s, i))
 
                 if next_s is None: # can we continue traversing dfa?
                     break
-                elif i >= len(self.input): # do we have enough input to do so?
+                elif i >= remaining: # do we have enough input to do so?
                     # this only occurs for large files or small chunk size
-                    if next_s not in F:
-                        save_state = next_s
+                    resume = (s, i, token_candidates)
                     input_ended = True
                     break
 
@@ -357,31 +572,18 @@ class Scanner(object):
                 continue
             
             if token_candidates:
-                max_token = token_candidates[-1] # pick maximal munch
-                state, lexim = max_token
-                self.input = self.input[len(lexim):] # advance in the input
+                state, length = token_candidates[-1] # pick maximal munch
+                self.pos = pos + length # advance in the input
                 token = state_to_token[state]
 
                 if token == "WHITESPACE" or token == "COMMENT": # these will not be returned
-                    self._switch_line(lexim.count("\n")) # update line number etc
+                    self._switch_line(self._count_newlines(pos, pos + length)) # update line number etc
                     continue # proceed to next token
 
-                if token == "ID_OR_KEYWORD": # distinguish between ids and keywords
-                    token = "KEYWORD" if lexim in self.keywords else "ID"
-
-                if self.max_state_size > 0:
-                    self.tokens[self.line_number].append((token, lexim)) # save tokens later for printing
-                
-                if token == "ID":
-                    if lexim not in self.identifiers:
-                        self.identifiers.append(lexim)
-                    lexim = self.update_symbol_table(lexim)
-
-                return (token, lexim)
+                return self._token(token, self._lexim(pos, pos + length))
             else:
-                print(f"[Panic Mode] Dropping '{self.input[:1]}' from line {self.line_number}")
-                self.input = self.input[1:]
-
+                print(f"[Panic Mode] Dropping '{self._lexim(pos, pos + 1)}' from line {self.line_number}")
+                self.pos = pos + 1
 
 def main(input_path):
     import time
@@ -398,6 +600,5 @@ def main(input_path):
 
 
 if __name__ == "__main__":
-    SymbolTableManager.init()
     input_path = os.path.join(script_dir, "input/input_simple.c")
     main(input_path)
\ No newline at end of file
@@ -6,13 +6,14 @@ Date:               16 March 2020
 '''
 
 import os
-from scanner import SymbolTableManager
-from code_gen import MemoryManager
 
 script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 class SemanticAnalyser(object):
-    def __init__(self):
+    def __init__(self, context):
+        self.context = context
+        self.symbol_table_manager = context.symbol_table_manager
+        self.memory_manager = context.memory_manager
 
         # routines
         self.semantic_checks = {
@@ -78,12 +79,12 @@ class SemanticAnalyser(object):
         self.fun_arg_list = []
         self._semantic_errors = []
 
-        self.semantic_error_file = os.path.join(script_dir, "errors", "semantic_errors.txt")
+        self.semantic_error_file = context.errors_path("semantic_errors.txt")
 
 
     @property
     def scope(self):
-        return len(SymbolTableManager.scope_stack) - 1
+        return len(self.symbol_table_manager.scope_stack) - 1
 
 
     @property
@@ -99,26 +100,24 @@ class SemanticAnalyser(object):
 
     def _get_lexim(self, token):
         if token[0] == "ID":
-            return SymbolTableManager.symbol_table[token[1]]['lexim']
+            return self.symbol_table_manager.symbol_table[token[1]]['lexim']
         else:
             return token[1]
 
 
     def save_semantic_errors(self):
-        with open(self.semantic_error_file, "w") as f:
-            f.write(self.semantic_errors)
+        self.context.write(self.semantic_error_file, self.semantic_errors)
 
 
     ''' semantic routines start here '''
 
 
     def inc_scope_routine(self, input_token, line_number):
-        SymbolTableManager.scope_stack.append(len(SymbolTableManager.symbol_table))
+        self.symbol_table_manager.push_scope()
 
 
     def dec_scope_routine(self, input_token, line_number):
-        scope_start_idx = SymbolTableManager.scope_stack.pop()
-        SymbolTableManager.symbol_table = SymbolTableManager.symbol_table[:scope_start_idx]
+        self.symbol_table_manager.pop_scope()
 
 
     def save_main_routine(self, input_token, line_number):
@@ -130,23 +129,23 @@ class SemanticAnalyser(object):
 
     
     def save_type_routine(self, input_token, line_number):
-        SymbolTableManager.declaration_flag = True
+        self.symbol_table_manager.declaration_flag = True
         self.semantic_stacks["type_assign"].append(input_token[1])
 
 
     def assign_type_routine(self, input_token, line_number):
         if input_token[0] == "ID" and self.semantic_stacks["type_assign"]:
             symbol_idx = input_token[1]
-            SymbolTableManager.symbol_table[symbol_idx]["type"] = self.semantic_stacks["type_assign"].pop()
+            self.symbol_table_manager.symbol_table[symbol_idx]["type"] = self.semantic_stacks["type_assign"].pop()
             self.semantic_stacks["type_assign"].append(symbol_idx)
-            SymbolTableManager.declaration_flag = False
+            self.symbol_table_manager.declaration_flag = False
         
 
     def assign_fun_role_routine(self, input_token, line_number):
         if self.semantic_stacks["type_assign"]:
             symbol_idx = self.semantic_stacks["type_assign"][-1]
-            SymbolTableManager.symbol_table[symbol_idx]["role"] = "function"
-            SymbolTableManager.symbol_table[symbol_idx]["address"] = MemoryManager.pb_index
+            self.symbol_table_manager.symbol_table[symbol_idx]["role"] = "function"
+            self.symbol_table_manager.symbol_table[symbol_idx]["address"] = self.memory_manager.pb_index
 
     
     def assign_param_role_routine(self, input_token, line_number):
@@ -156,12 +155,12 @@ class SemanticAnalyser(object):
     def assign_var_role_routine(self, input_token, line_number, role="local_var"):
         if self.semantic_stacks["type_assign"]:
             symbol_idx = self.semantic_stacks["type_assign"][-1]
-            symbol_row = SymbolTableManager.symbol_table[symbol_idx]
+            symbol_row = self.symbol_table_manager.symbol_table[symbol_idx]
             symbol_row["role"] = role
             if self.scope == 0:
                 symbol_row["role"] = "global_var"
             if symbol_row["type"] == "void":
-                SymbolTableManager.error_flag = True
+                self.symbol_table_manager.error_flag = True
                 self._semantic_errors.append((line_number, "Illegal type of void for '{}'.".format(symbol_row["lexim"])))
                 symbol_row.pop("type") # void types are not considered to be defined
             if input_token[1] == "[":
@@ -171,19 +170,19 @@ class SemanticAnalyser(object):
     def assign_length_routine(self, input_token, line_number):
         if self.semantic_stacks["type_assign"]:
             symbol_idx = self.semantic_stacks["type_assign"].pop()
-            symbol_row = SymbolTableManager.symbol_table[symbol_idx]
+            symbol_row = self.symbol_table_manager.symbol_table[symbol_idx]
             if input_token[0] == "NUM":
                 symbol_row["arity"] = int(input_token[1])
                 if symbol_row["role"] == "param":
-                    symbol_row["offset"] = MemoryManager.get_param_offset()
+                    symbol_row["offset"] = self.memory_manager.get_param_offset()
                 else: 
-                    symbol_row["address"] = MemoryManager.get_static(int(input_token[1]))
+                    symbol_row["address"] = self.memory_manager.get_static(int(input_token[1]))
             else:
-                SymbolTableManager.symbol_table[symbol_idx]["arity"] = 1
+                self.symbol_table_manager.symbol_table[symbol_idx]["arity"] = 1
                 if symbol_row["role"] == "param":
-                    symbol_row["offset"] = MemoryManager.get_param_offset()
+                    symbol_row["offset"] = self.memory_manager.get_param_offset()
                 else:
-                    symbol_row["address"] = MemoryManager.get_static()
+                    symbol_row["address"] = self.memory_manager.get_static()
                 
             if input_token[1] == "[" and self.fun_param_list:
                 self.fun_param_list[-1] = "array"
@@ -194,29 +193,29 @@ class SemanticAnalyser(object):
 
     
     def push_arg_stack_routine(self, input_token, line_number):
-        SymbolTableManager.arg_list_stack.append([])
+        self.symbol_table_manager.arg_list_stack.append([])
 
 
     def pop_arg_stack_routine(self, input_token, line_number):
-        if len(SymbolTableManager.arg_list_stack) > 1:
-            SymbolTableManager.arg_list_stack.pop()
+        if len(self.symbol_table_manager.arg_list_stack) > 1:
+            self.symbol_table_manager.arg_list_stack.pop()
 
     
     def save_arg_routine(self, input_token, line_number):
         if input_token[0] == "ID":
-            SymbolTableManager.arg_list_stack[-1].append(SymbolTableManager.symbol_table[input_token[1]].get("type"))
+            self.symbol_table_manager.arg_list_stack[-1].append(self.symbol_table_manager.symbol_table[input_token[1]].get("type"))
         else:
-            SymbolTableManager.arg_list_stack[-1].append("int")
+            self.symbol_table_manager.arg_list_stack[-1].append("int")
 
 
     def assign_fun_attrs_routine(self, input_token, line_number):
         if self.semantic_stacks["type_assign"]:
             symbol_idx = self.semantic_stacks["type_assign"].pop()
             params = self.fun_param_list
-            SymbolTableManager.symbol_table[symbol_idx]["arity"] = len(params)
-            SymbolTableManager.symbol_table[symbol_idx]["params"] = params
+            self.symbol_table_manager.symbol_table[symbol_idx]["arity"] = len(params)
+            self.symbol_table_manager.symbol_table[symbol_idx]["params"] = params
             self.fun_param_list = []
-            SymbolTableManager.temp_stack.append(0) # init temp counter for this function
+            self.symbol_table_manager.temp_stack.append(0) # init temp counter for this function
 
 
     def check_main_routine(self, input_token, line_number):
@@ -236,33 +235,33 @@ class SemanticAnalyser(object):
     
 
     def check_declaration_routine(self, input_token, line_number):
-        if "type" not in SymbolTableManager.symbol_table[input_token[1]]:
+        if "type" not in self.symbol_table_manager.symbol_table[input_token[1]]:
             lexim = self._get_lexim(input_token)
-            SymbolTableManager.error_flag = True
+            self.symbol_table_manager.error_flag = True
             self._semantic_errors.append((line_number, f"'{lexim}' is not defined."))
 
     
     def save_fun_routine(self, input_token, line_number):
-        if SymbolTableManager.symbol_table[input_token[1]].get("role") == "function":
+        if self.symbol_table_manager.symbol_table[input_token[1]].get("role") == "function":
             self.semantic_stacks["fun_check"].append(input_token[1])
 
 
     def check_args_routine(self, input_token, line_number):
         if self.semantic_stacks["fun_check"]:
             fun_id = self.semantic_stacks["fun_check"].pop()
-            lexim = SymbolTableManager.symbol_table[fun_id]["lexim"]
-            args = SymbolTableManager.arg_list_stack[-1]
+            lexim = self.symbol_table_manager.symbol_table[fun_id]["lexim"]
+            args = self.symbol_table_manager.arg_list_stack[-1]
             if args is not None:
                 self.semantic_stacks["type_check"] = self.semantic_stacks["type_check"][:len(args)]
-                if SymbolTableManager.symbol_table[fun_id]["arity"] != len(args):
-                    SymbolTableManager.error_flag = True
+                if self.symbol_table_manager.symbol_table[fun_id]["arity"] != len(args):
+                    self.symbol_table_manager.error_flag = True
                     self._semantic_errors.append((line_number, f"Mismatch in numbers of arguments of '{lexim}'."))
                 else:
-                    params = SymbolTableManager.symbol_table[fun_id]["params"]
+                    params = self.symbol_table_manager.symbol_table[fun_id]["params"]
                     i = 1
                     for param, arg in zip(params, args):
                         if param != arg and arg is not None:
-                            SymbolTableManager.error_flag = True
+                            self.symbol_table_manager.error_flag = True
                             self._semantic_errors.append((line_number, f"Mismatch in type of argument {i} of '{lexim}'. Expected '{param}' but got '{arg}' instead."))
                         i += 1
 
@@ -273,7 +272,7 @@ class SemanticAnalyser(object):
 
     def check_while_routine(self, input_token, line_number):
         if self.while_counter <= 0:
-            SymbolTableManager.error_flag = True
+            self.symbol_table_manager.error_flag = True
             self._semantic_errors.append((line_number, f"No 'while' found for 'continue'"))
 
 
@@ -287,7 +286,7 @@ class SemanticAnalyser(object):
 
     def check_break_routine(self, input_token, line_number):
         if self.while_counter <= 0 and self.switch_counter <= 0:
-            SymbolTableManager.error_flag = True
+            self.symbol_table_manager.error_flag = True
             self._semantic_errors.append((line_number, "No 'while' or 'switch' found for 'break'."))
 
 
@@ -297,7 +296,7 @@ class SemanticAnalyser(object):
 
     def save_type_check_routine(self, input_token, line_number):
         if input_token[0] == "ID":
-            operand_type = SymbolTableManager.symbol_table[input_token[1]].get("type")
+            operand_type = self.symbol_table_manager.symbol_table[input_token[1]].get("type")
         else:
             operand_type = "int"
         self.semantic_stacks["type_check"].append(operand_type)
@@ -319,11 +318,11 @@ class SemanticAnalyser(object):
             operand_a_type = self.semantic_stacks["type_check"].pop()
             if operand_b_type is not None and operand_a_type is not None:
                 if operand_a_type == "array":
-                    SymbolTableManager.error_flag = True
+                    self.symbol_table_manager.error_flag = True
                     self._semantic_errors.append((line_number, 
                         f"Type mismatch in operands, Got '{operand_a_type}' instead of 'int'."))
                 elif operand_a_type != operand_b_type:
-                    SymbolTableManager.error_flag = True
+                    self.symbol_table_manager.error_flag = True
                     self._semantic_errors.append((line_number, 
                         f"Type mismatch in operands, Got '{operand_b_type}' instead of '{operand_a_type}'."))
                 else:
@@ -344,5 +343,12 @@ class SemanticAnalyser(object):
 
     def eof_check(self, line_number):
         if not self.main_found or self.main_not_last:
-            SymbolTableManager.error_flag = True
+            self.symbol_table_manager.error_flag = True
             self._semantic_errors.append((line_number, "main function not found!"))
+
+
+    def temps_check(self, line_number, temps_error):
+        ''' temps_error is CodeGen.temps_error of the finished program '''
+        if temps_error is not None:
+            self.symbol_table_manager.error_flag = True
+            self._semantic_errors.append((line_number, temps_error))
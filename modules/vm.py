@@ -0,0 +1,263 @@
+'''
+Virtual Machine module of the Simple C Compiler
+
+Executes the three address code program block
+produced by the code generator in-process
+'''
+
+import os
+from ir import ASSIGN, ADD, SUB, MULT, EQ, LT, JP, JPF, PRINT, DIRECT, IMMEDIATE, INDIRECT, \
+               format_instruction, load_program_file, to_word, WORD_BITS
+from cfg import find_leaders
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# maximum number of executed instructions before we assume an infinite loop
+MAX_STEPS = 10 ** 7
+
+# file name of the source code of the compiled basic blocks in tracebacks
+code_file_name = "<three address code>"
+
+# the compiled execution tier wraps arithmetic inline like ir.to_word
+word_offset = 2 ** (WORD_BITS - 1)
+word_mask = 2 ** WORD_BITS - 1
+
+
+class VirtualMachine(object):
+    ''' Interpreter for the three address code which is a
+        drop-in replacement for the prebuilt tester programs '''
+
+    def __init__(self, program):
+        ''' program is a list of instructions (see ir.py) indexed by line
+            number, invalid instructions (None) only fail if they are executed '''
+        self.program = list(program)
+        self.memory = {}
+        self.output = []
+        self.pc = 0
+        self.steps = 0
+
+
+    @classmethod
+    def from_file(cls, program_file):
+        if not os.path.isabs(program_file):
+            program_file = os.path.join(script_dir, program_file)
+        return cls(load_program_file(program_file))
+
+
+    def run(self, max_steps=MAX_STEPS, trace=False):
+        ''' executes the program until the program counter runs past the end
+            of the program block, returns list of printed values '''
+        program = self.program
+        memory = self.memory
+        output = self.output
+        n = len(program)
+        pc = current = self.pc
+        steps = self.steps
+
+        def load(operand):
+            mode, value = operand
+            if mode == DIRECT:
+                return memory[value]
+            if mode == IMMEDIATE:
+                return value
+            return memory[memory[value]]
+
+        def store(operand, value):
+            mode, addr = operand
+            if mode == INDIRECT:
+                addr = memory[addr]
+            elif mode == IMMEDIATE:
+                raise RuntimeError(f"Immediate operand can not be assigned to at PC = {current}")
+            memory[addr] = value
+
+        def target(operand):
+            mode, value = operand
+            return memory[value] if mode == INDIRECT else value
+
+        try:
+            while 0 <= pc < n:
+                if steps >= max_steps:
+                    raise RuntimeError(f"Execution exceeded {max_steps} steps")
+                steps += 1
+                if trace:
+                    print(f"--->  PC = {pc}\tcommand : {format_instruction(program[pc])}")
+                current = pc
+                op, a, b, c = program[pc]
+                pc += 1
+                if op == ASSIGN:
+                    store(b, load(a))
+                elif op == ADD:
+                    store(c, to_word(load(a) + load(b)))
+                elif op == SUB:
+                    store(c, to_word(load(a) - load(b)))
+                elif op == MULT:
+                    store(c, to_word(load(a) * load(b)))
+                elif op == EQ:
+                    store(c, int(load(a) == load(b)))
+                elif op == LT:
+                    store(c, int(load(a) < load(b)))
+                elif op == JP:
+                    pc = target(a)
+                elif op == JPF:
+                    if not load(a):
+                        pc = target(b)
+                else: # op == PRINT
+                    output.append(load(a))
+        except (KeyError, IndexError):
+            raise RuntimeError(f"Invalid access to memory at PC = {current}")
+        except TypeError:
+            raise RuntimeError(f"Invalid instruction at PC = {current}")
+        finally:
+            self.pc = pc
+            self.steps = steps
+        return output
+
+
+class CompiledVirtualMachine(VirtualMachine):
+    ''' Second execution tier which translates the basic blocks of the program
+        into Python functions with compile(), so that every instruction is
+        decoded only once instead of on every execution step.
+
+        Memory is the same dict as in the interpreter, so invalid memory
+        accesses fail at the same instruction with the same error. '''
+
+    def __init__(self, program):
+        super().__init__(program)
+        self.leaders = set(find_leaders(self.program)) # basic blocks, see cfg.py
+        self.blocks = {}
+        self._compile_blocks(sorted(self.leaders))
+
+
+    @staticmethod
+    def _operand_source(operand):
+        mode, value = operand
+        if mode == DIRECT:
+            return f"m[{value}]"
+        if mode == IMMEDIATE:
+            return str(value)
+        return f"m[m[{value}]]"
+
+
+    @staticmethod
+    def _target_source(operand):
+        mode, value = operand
+        return f"m[{value}]" if mode == INDIRECT else str(value)
+
+
+    def _block_source(self, start):
+        ''' translates basic block starting at program index start
+            into source code of a function returning the next pc '''
+        lines = [f"def block_{start}(m, out):"]
+        n = len(self.program)
+        pc = start
+        while True:
+            instruction = self.program[pc]
+            pc += 1
+            try:
+                op, a, b, c = instruction
+                dest = b if op == ASSIGN else c if op in (ADD, SUB, MULT, EQ, LT) else None
+                if dest is not None and dest[0] == IMMEDIATE:
+                    lines.append(f"raise RuntimeError('Immediate operand can not be assigned to at PC = {pc - 1}')")
+                    break
+                if op == ASSIGN:
+                    lines.append(f"{self._operand_source(b)} = {self._operand_source(a)}")
+                elif op in (ADD, SUB, MULT):
+                    binop = {ADD : "+", SUB : "-", MULT : "*"}[op]
+                    lines.append(f"{self._operand_source(c)} = "
+                                 f"(({self._operand_source(a)} {binop} {self._operand_source(b)}) + {word_offset} & {word_mask})"
+                                 f" - {word_offset}") # see ir.to_word
+                elif op in (EQ, LT):
+                    relop = {EQ : "==", LT : "<"}[op]
+                    lines.append(f"{self._operand_source(c)} = "
+                                 f"1 if {self._operand_source(a)} {relop} {self._operand_source(b)} else 0")
+                elif op == JP:
+                    lines.append(f"return {self._target_source(a)}")
+                    break
+                elif op == JPF:
+                    lines.append(f"if not {self._operand_source(a)}: return {self._target_source(b)}")
+                    lines.append(f"return {pc}")
+                    break
+                else: # op == PRINT
+                    lines.append(f"out({self._operand_source(a)})")
+            except TypeError:
+                lines.append(f"raise RuntimeError('Invalid instruction at PC = {pc - 1}')")
+                break
+            if pc >= n or pc in self.leaders:
+                lines.append(f"return {pc}")
+                break
+        return "\n    ".join(lines) + "\n", pc - start
+
+
+    def _compile_blocks(self, leaders):
+        sources = []
+        sizes = []
+        for start in leaders:
+            source, size = self._block_source(start)
+            sources.append(source)
+            sizes.append(size)
+        namespace = {}
+        exec(compile("\n".join(sources), code_file_name, "exec"), namespace)
+        for start, size in zip(leaders, sizes):
+            self.blocks[start] = (size, namespace[f"block_{start}"])
+
+
+    @staticmethod
+    def _failing_pc(error, block_start):
+        ''' returns the pc of the instruction of a compiled block which raised
+            error, every instruction is on its own line of the block function '''
+        pc = block_start
+        tb = error.__traceback__
+        while tb is not None:
+            code = tb.tb_frame.f_code
+            if code.co_filename == code_file_name:
+                pc = int(code.co_name[len("block_"):]) + tb.tb_lineno - code.co_firstlineno - 1
+            tb = tb.tb_next
+        return pc
+
+
+    def run(self, max_steps=MAX_STEPS, trace=False):
+        if trace:
+            return super().run(max_steps, trace)
+        blocks = self.blocks
+        memory = self.memory
+        out = self.output.append
+        n = len(self.program)
+        pc = block_start = self.pc
+        steps = self.steps
+        try:
+            while 0 <= pc < n:
+                if steps >= max_steps:
+                    raise RuntimeError(f"Execution exceeded {max_steps} steps")
+                block_start = pc
+                try:
+                    size, block = blocks[pc]
+                except KeyError:
+                    # entry point of an indirect jump (function return address)
+                    self._compile_blocks([pc])
+                    size, block = blocks[pc]
+                steps += size
+                pc = block(memory, out)
+        except KeyError as e:
+            raise RuntimeError(f"Invalid access to memory at PC = {self._failing_pc(e, block_start)}")
+        finally:
+            self.pc = pc
+            self.steps = steps
+        return self.output
+
+
+def main(program_file, tier=1):
+    import time
+    if tier == 2:
+        vm = CompiledVirtualMachine.from_file(program_file)
+    else:
+        vm = VirtualMachine.from_file(program_file)
+    start = time.time()
+    output = vm.run()
+    stop = time.time() - start
+    print(f"Execution took {stop:.6f} s ({vm.steps} steps)")
+    print("\n".join(str(value) for value in output))
+
+
+if __name__ == "__main__":
+    program_file = os.path.join(script_dir, "output/output.txt")
+    main(program_file)
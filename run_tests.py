@@ -6,10 +6,10 @@ sys.path.insert(0, os.path.join(script_dir, "modules"))
 
 import difflib
 import argparse
-import platform
-from subprocess import check_output, PIPE, TimeoutExpired
 from cparser import main as parse
 from scanner import main as scan
+from vm import VirtualMachine
+from optimizer import opt_levels
 
 '''
 Expected folder structure for automatic testing
@@ -37,12 +37,18 @@ project_root
             ├── input.txt
             ├── parse_tree.txt
             └── syntax_errors.txt
+
+Expected files named NAME.O<level>.txt replace NAME.txt when the tests
+are run with -O <level>. The output.txt of TXX tests is a model program
+whose output the compiled program must reproduce, other expected files
+are compared like in the other tests.
 '''
 
 parser = argparse.ArgumentParser(description='Automatic test case runner for Compilers course exercises.')
 parser.add_argument('-v', '--verbose', action='store_true', help='Print difference info between actual and model output.')
 parser.add_argument('--from-test', type=int, default=0, help='Test number to start from')
 parser.add_argument('--to-test', type=int, default=None, help='Test number to stop to')
+parser.add_argument('-O', dest='opt_level', type=int, choices=opt_levels, default=0, help='Optimization level of the compiled programs')
 args = parser.parse_args()
 
 test_dir = os.path.join(script_dir, "tests")
@@ -75,14 +81,20 @@ for test_case in sorted(os.listdir(test_dir)):
         continue
     test_case_dir = os.path.join(test_dir, test_case)
     output_dir = os.path.join(script_dir, "output")
-    test_files = list(os.listdir(test_case_dir))
-    input_file = os.path.join(test_case_dir, test_files.pop(test_files.index("input.txt")))
+    expected_files = {} # name of the output file -> expected file
+    for test_file in sorted(os.listdir(test_case_dir)):
+        name, _, level = test_file[:-len(".txt")].partition(".O")
+        if not level:
+            expected_files.setdefault(f"{name}.txt", test_file)
+        elif level == str(args.opt_level):
+            expected_files[f"{name}.txt"] = test_file
+    input_file = os.path.join(test_case_dir, expected_files.pop("input.txt"))
 
     try:
         if test_case.startswith("TS"):
             scan(input_file)
         else:
-            parse(input_file)
+            parser = parse(input_file, opt_level=args.opt_level)
     except Exception as e:
         # raise e
         print("Execution failed:", str(e))
@@ -92,56 +104,35 @@ for test_case in sorted(os.listdir(test_dir)):
 
     if not fail:
         if test_case.startswith("TXX"):
-            plat = platform.system()
-            if plat == "Windows":
-                tester_file = os.path.join(script_dir, "interpreter", "tester_Windows.exe")
-            elif plat == "Linux":
-                tester_file = os.path.join(script_dir, "interpreter", "tester_Linux.out")
-            elif plat == "Darwin":
-                tester_file = os.path.join(script_dir, "interpreter", "tester_Mac.out")
+            model_output_file = os.path.join(test_case_dir, expected_files.pop("output.txt"))
+            model_vm = VirtualMachine.from_file(model_output_file)
+            vm = VirtualMachine(parser.code_generator.program_block)
+            # a program which failed to compile is not run, it has no output
+            for program_vm in (model_vm, vm) if not parser.context.error_flag else (model_vm,):
+                try:
+                    program_vm.run()
+                except RuntimeError as e:
+                    print(f"{test_case}: Program execution failed: {str(e)}")
+            model_tester_output = "\n".join(str(value) for value in model_vm.output)
+            tester_output = "\n".join(str(value) for value in vm.output)
+            fail = check_diff(test_case, None, model_tester_output, tester_output)
+        for output_name, test_file in expected_files.items():
+            model_answer_file = os.path.join(test_case_dir, test_file)
+            if "error" in output_name:
+                output_file = os.path.join(script_dir, "errors", output_name)
             else:
-                raise RuntimeError("Unsupported operating system for code execution!")
-            model_output_file = os.path.join(test_case_dir, "output.txt")
-            output_file = os.path.join(script_dir, "output", "output.txt")
+                output_file = os.path.join(script_dir, "output", output_name)
             if not os.path.exists(output_file):
-                fail = True
-            else:
-                with open(model_output_file, "r", encoding="utf-8") as f:
-                    model_output = f.read()
+                open(output_file, "a").close()
+            
+            with open(model_answer_file, "r", encoding="utf-8") as f:
+                model_answer = f.read().lower().strip()
 
-                with open(output_file, "r", encoding="utf-8") as f:
-                    output = f.read()
-                try:
-                    model_tester_output = check_output(tester_file, cwd=test_case_dir, stderr=PIPE, timeout=5).decode("utf-8")
-                    tester_output = check_output(tester_file, cwd=output_dir, stderr=PIPE, timeout=5).decode("utf-8")
-                except TimeoutExpired:
-                    print(f"{test_case}: Tester program execution timed out!")
-                    fail = True
-                else:
-                    model_tester_output = "\n".join([line for line in model_tester_output.splitlines() 
-                                                    if line.startswith("PRINT")])
-                    tester_output = "\n".join([line for line in tester_output.splitlines()
-                                                    if line.startswith("PRINT")])
-
-                    fail = check_diff(test_case, None, model_tester_output.strip(), tester_output.strip())
-        else:
-            for test_file in test_files:
-                model_answer_file = os.path.join(test_case_dir, test_file)
-                if "error" in test_file:
-                    output_file = os.path.join(script_dir, "errors", test_file)
-                else:
-                    output_file = os.path.join(script_dir, "output", test_file)
-                if not os.path.exists(output_file):
-                    open(output_file, "a").close()
-                
-                with open(model_answer_file, "r", encoding="utf-8") as f:
-                    model_answer = f.read().lower().strip()
-
-                with open(output_file, "r", encoding="utf-8") as f:
-                    output = f.read().lower().strip()
-
-                fail = fail or check_diff(test_case, test_file, model_answer, output)
-                
+            with open(output_file, "r", encoding="utf-8") as f:
+                output = f.read().lower().strip()
+
+            fail = fail or check_diff(test_case, test_file, model_answer, output)
+            
     if fail:
         print(f"{test_case} failed!")
     else: